@@ -26,7 +26,6 @@ setup(
         'License :: OSI Approved :: BSD License',
         'Operating System :: OS Independent',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 3.4',
         'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
@@ -39,5 +38,6 @@ setup(
         "Wagtail>=2.3,<2.8",
         "Whoosh>=2.7,<2.8",
     ],
+    python_requires='>=3.5',
     test_suite='runtests.runtests'
 )
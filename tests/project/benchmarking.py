@@ -0,0 +1,229 @@
+"""
+Helpers shared by the benchmark commands of the test project
+"""
+
+import os
+from argparse import ArgumentTypeError
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate
+from random import Random
+from time import perf_counter
+
+from django.db.models.signals import post_delete, post_save
+from wagtail.search.signal_handlers import (
+    post_delete_signal_handler,
+    post_save_signal_handler,
+)
+
+from .models import Article
+
+CONSONANTS = "bcdfghjklmnprstvwz"
+VOWELS = "aeiou"
+
+
+class Corpus:
+    """
+    Generates a reproducible corpus of articles from a seed.
+
+    Words are made of random syllables and drawn following Zipf's law, so term
+    frequencies look like the ones of a natural language.
+    """
+
+    def __init__(self, seed, vocabulary_size=20000):
+        self.random = Random(seed)
+        self.words = self._make_vocabulary(vocabulary_size)
+        self.cum_weights = list(
+            accumulate(1.0 / rank for rank in range(1, vocabulary_size + 1))
+        )
+        self.start_date = datetime(2010, 1, 1)
+        self.end_date = datetime(2020, 1, 1)
+
+    def _make_word(self):
+        return "".join(
+            self.random.choice(CONSONANTS) + self.random.choice(VOWELS)
+            for _ in range(self.random.randint(1, 4))
+        )
+
+    def _make_vocabulary(self, size):
+        words = []
+        seen = set()
+        while len(words) < size:
+            word = self._make_word()
+            if len(word) > 2 and word not in seen:
+                seen.add(word)
+                words.append(word)
+        return words
+
+    def sample_words(self, k):
+        return weighted_choices(self.random, self.words, self.cum_weights, k)
+
+    def query_words(self, k, min_length=6):
+        """
+        Returns words to search for, skipping the most frequent ones which
+        would behave like stop words.
+        """
+        candidates = [word for word in self.words[50:2000] if len(word) >= min_length]
+        return [self.random.choice(candidates) for _ in range(k)]
+
+    def title(self):
+        return " ".join(self.sample_words(self.random.randint(3, 10))).capitalize()
+
+    def paragraph(self):
+        words = self.sample_words(self.random.randint(20, 80))
+        # Like the output of the rich text editor, with links and formatting
+        for _ in range(self.random.randint(0, 3)):
+            position = self.random.randrange(len(words))
+            if self.random.random() < 0.5:
+                words[position] = '<a id="%s" linktype="page">%s</a>' % (
+                    self.random.randint(1, 10000),
+                    words[position],
+                )
+            else:
+                words[position] = "<b>%s</b>" % words[position]
+        return "<p>%s.</p>" % " ".join(words)
+
+    def image(self):
+        return '<embed alt="%s" embedtype="image" format="left" id="%s"/>' % (
+            " ".join(self.sample_words(3)),
+            self.random.randint(1, 10000),
+        )
+
+    def body(self):
+        blocks = [self.paragraph() for _ in range(self.random.randint(2, 5))]
+        if self.random.random() < 0.3:
+            blocks.insert(1, self.image())
+        return "".join(blocks)
+
+    def published_at(self):
+        minutes = (self.end_date - self.start_date).total_seconds() // 60
+        return self.start_date + timedelta(minutes=self.random.randint(0, minutes))
+
+    def create_articles(self, count, batch_size=1000):
+        while count > 0:
+            batch = min(batch_size, count)
+            Article.objects.bulk_create(
+                [
+                    Article(
+                        title=self.title(),
+                        body=self.body(),
+                        first_published_at=self.published_at(),
+                    )
+                    for _ in range(batch)
+                ]
+            )
+            count -= batch
+
+
+def weighted_choices(random, population, cum_weights, k=1):
+    """
+    Draws ``k`` items like ``Random.choices``, which needs Python 3.6, and
+    returns the same items for the same seed.
+    """
+    total = cum_weights[-1]
+    hi = len(population) - 1
+    return [
+        population[bisect(cum_weights, random.random() * total, 0, hi)]
+        for _ in range(k)
+    ]
+
+
+def strictly_positive_int(value):
+    type_error = ArgumentTypeError("%s must be a strictly positive integer." % value)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise type_error
+    if value <= 0:
+        raise type_error
+    return value
+
+
+def time_once(func):
+    start = perf_counter()
+    func()
+    return perf_counter() - start
+
+
+@contextmanager
+def signal_handlers_disconnected():
+    """
+    Articles are indexed by the benchmarks themselves, not when they are saved
+    or deleted
+    """
+    post_delete.disconnect(post_delete_signal_handler, sender=Article)
+    post_save.disconnect(post_save_signal_handler, sender=Article)
+    try:
+        yield
+    finally:
+        post_save.connect(post_save_signal_handler, sender=Article)
+        post_delete.connect(post_delete_signal_handler, sender=Article)
+
+
+def percentile(sorted_values, p):
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not sorted_values:
+        return None
+    rank = max(0, int(round(p / 100.0 * len(sorted_values))) - 1)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(samples, items=1):
+    """
+    Summarizes latencies in seconds, ``items`` is the number of documents or
+    queries processed by each sample, used for the throughput.
+    """
+    samples = sorted(samples)
+    total = sum(samples)
+    return {
+        "samples": len(samples),
+        "mean_ms": total / len(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p90_ms": percentile(samples, 90) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": samples[-1] * 1000,
+        "throughput_per_sec": len(samples) * items / total if total else None,
+    }
+
+
+def directory_size(path):
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                # Whoosh may have merged the segment away in the meantime
+                pass
+    return size
+
+
+def compare_reports(baseline, current, threshold):
+    """
+    Yields ``(size, metric, before, after)`` for every latency or index size
+    that grew by more than ``threshold`` (a ratio) compared to the baseline.
+    """
+    baseline_runs = {run["size"]: run for run in baseline["runs"]}
+    for run in current["runs"]:
+        baseline_run = baseline_runs.get(run["size"])
+        if baseline_run is None:
+            continue
+        metrics = [("index_size_bytes", baseline_run, run)]
+        for operation, stats in run["operations"].items():
+            if operation in baseline_run["operations"]:
+                metrics.append(
+                    (
+                        "%s.p50_ms" % operation,
+                        baseline_run["operations"][operation],
+                        stats,
+                    )
+                )
+        for metric, before, after in metrics:
+            key = metric.rsplit(".", 1)[-1]
+            if not before.get(key) or after.get(key) is None:
+                continue
+            if after[key] > before[key] * (1 + threshold):
+                yield run["size"], metric, before[key], after[key]
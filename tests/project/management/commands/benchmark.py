@@ -1,186 +1,332 @@
-from argparse import ArgumentTypeError, FileType
+import json
+import platform
+import tempfile
+from argparse import FileType
 from contextlib import contextmanager
 from io import StringIO
-from random import seed, randint, choices, choice
-from time import time
 
+import django
+import wagtail
+import whoosh
 from django.conf import settings
-from django.core.management import BaseCommand, call_command
+from django.core.management import BaseCommand, CommandError, call_command
 from django.db import connection
-from django.db.models.signals import post_save, post_delete
-from wagtail.contrib.postgres_search.models import IndexEntry
 from wagtail.search.backends import get_search_backend
-from wagtail.search.backends.db import DatabaseSearchBackend
-from wagtail.search.signal_handlers import (
-    post_save_signal_handler,
-    post_delete_signal_handler,
-)
 
+from wagtail_whoosh.utils import peak_rss_kb
+
+from ...benchmarking import (
+    Corpus,
+    compare_reports,
+    directory_size,
+    signal_handlers_disconnected,
+    strictly_positive_int,
+    summarize,
+    time_once,
+)
 from ...models import Article
 
-
-def format_time(s):
-    for unit in ("s", "ms", "μs"):
-        if s > 1:
-            return "%.2f %s" % (s, unit)
-        s *= 1000
-    return "%.2f ns" % s
-
-
-def strictly_positive_int(value):
-    type_error = ArgumentTypeError("%s must be a strictly positive integer." % value)
-    try:
-        value = int(value)
-    except (TypeError, ValueError):
-        raise type_error
-    if value <= 0:
-        raise type_error
-    return value
-
-
-def time_it(func, title="", backend_name=""):
-    n = 3
-    start = time()
-    while True:
-        for i in range(n):
-            func()
-        elapsed_time = time() - start
-        if elapsed_time > 1:
-            break
-        n *= 10
-    print(
-        "%-30s %-15s %9s %15s"
-        % (title, backend_name, format_time(elapsed_time / n), "%s runs" % n)
-    )
+# Offset of the deep page of results
+DEEP_PAGE = 100
 
 
 class Command(BaseCommand):
+    help = (
+        "Benchmarks indexing and searching a generated corpus of articles, "
+        "e.g. ./manage.py benchmark --settings=tests.benchmark_settings"
+    )
+
     def add_arguments(self, parser):
         parser.add_argument(
-            "-d",
-            "--dictionary",
-            type=FileType("r"),
-            default="/usr/share/dict/words",
-            help="Path to a dictionary file " "containing a word per line.",
+            "--sizes",
+            type=strictly_positive_int,
+            nargs="+",
+            default=[1000, 10000],
+            help="Corpus sizes to benchmark, in increasing order.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--samples",
+            type=strictly_positive_int,
+            default=50,
+            help="Number of timed runs of each search and single document operation.",
+        )
+        parser.add_argument(
+            "--backend", default="default", help="Name of the search backend."
+        )
+        parser.add_argument(
+            "--html-stripping",
+            action="store_true",
+            help="Compare the size of the index with and without stripping HTML.",
+        )
+        parser.add_argument(
+            "-o", "--output", type=FileType("w"), help="Write the JSON report here."
         )
-        parser.add_argument("-s", "--start", type=strictly_positive_int, default=1)
         parser.add_argument(
-            "-m", "--step-magnitude", type=strictly_positive_int, default=5
+            "--compare",
+            type=FileType("r"),
+            help="JSON report of a previous run to check for regressions.",
         )
-        parser.add_argument("--seed", default="random seed")
         parser.add_argument(
-            "-l", "--limit", type=strictly_positive_int, default=1000000
+            "--threshold",
+            type=float,
+            default=0.1,
+            help="Relative increase reported as a regression (default 0.1).",
+        )
+
+    def write_stats(self, operation, stats):
+        self.stdout.write(
+            "%-22s %10.2f ms p50 %10.2f ms p90 %10.2f ms p99 %12.1f /s"
+            % (
+                operation,
+                stats["p50_ms"],
+                stats["p90_ms"],
+                stats["p99_ms"],
+                stats["throughput_per_sec"] or 0,
+            )
         )
 
-    def create_article_bulk(self, dictionary, bulk_size):
-        Article.objects.bulk_create(
+    def sample(self, func, args_list):
+        return [time_once(lambda: func(*args)) for args in args_list]
+
+    def benchmark_indexing(self, size):
+        operations = {}
+        backend = self.backend
+
+        def bulk():
+            backend.reset_index()
+            backend.add_bulk(Article, Article.objects.all())
+
+        operations["bulk_index"] = summarize([time_once(bulk)], items=size)
+        operations["rebuild"] = summarize(
             [
-                Article(
-                    title=" ".join(choices(dictionary, k=randint(3, 10))),
-                    body=" ".join(choices(dictionary, k=randint(50, 300))),
+                time_once(
+                    lambda: call_command(
+                        "update_index",
+                        backend_name=self.backend_name,
+                        stdout=StringIO(),
+                    )
                 )
-                for i in range(bulk_size)
-            ]
+            ],
+            items=size,
         )
 
-    @property
-    def backends(self):
-        for backend_name in settings.WAGTAILSEARCH_BACKENDS:
-            yield backend_name, get_search_backend(backend=backend_name)
+        with tempfile.TemporaryFile() as archive:
+            operations["snapshot_export"] = summarize(
+                [time_once(lambda: backend.export_snapshot(archive))], items=size
+            )
 
-    def update_index(self, backend_name):
-        call_command("update_index", backend_name=backend_name, stdout=StringIO())
+            def restore():
+                archive.seek(0)
+                backend.restore_snapshot(archive)
+                backend.catch_up()
 
-    def unsorted_autocomplete(self, backend):
-        list(
-            backend.autocomplete(self.partial_word, Article, order_by_relevance=False)[
-                :10
-            ]
-        )
+            operations["snapshot_restore"] = summarize([time_once(restore)], items=size)
 
-    def sorted_autocomplete(self, backend):
-        list(
-            backend.autocomplete(self.partial_word, Article, order_by_relevance=True)[
-                :10
-            ]
+        pks = list(Article.objects.values_list("pk", flat=True))
+        sample_pks = self.corpus.random.sample(pks, min(self.samples, len(pks)))
+        articles = list(Article.objects.filter(pk__in=sample_pks))
+        # Saving an article whose indexed fields didn't change is only a lookup
+        operations["add_unchanged"] = summarize(
+            self.sample(backend.add, [(article,) for article in articles])
         )
+        # Edit the titles without drawing random numbers, so that the searched
+        # words don't change
+        for article in articles:
+            article.title = " ".join(reversed(article.title.split()))
+            article.save(update_fields=["title"])
+        operations["add"] = summarize(
+            self.sample(backend.add, [(article,) for article in articles])
+        )
+        operations["delete"] = summarize(
+            self.sample(backend.delete, [(article,) for article in articles])
+        )
+        # Put the deleted articles back for the search benchmarks
+        backend.add_bulk(Article, articles)
+        return operations
 
-    def unsorted_search(self, backend):
-        list(backend.search(self.word, Article, order_by_relevance=False)[:10])
-
-    def sorted_search(self, backend):
-        list(backend.search(self.word, Article, order_by_relevance=True)[:10])
-
-    def step(self, dictionary, bulk_size):
-        print("Adding %s articles…" % bulk_size, end="\r")
-        self.create_article_bulk(dictionary, bulk_size)
-        print("Testing with %s articles:" % Article.objects.count())
-        for backend_name, backend in self.backends:
-            time_it(
-                lambda: self.update_index(backend_name),
-                title="Update index",
-                backend_name=backend_name,
-            )
-        print("Optimizing the database…", end="\r")
-        with connection.cursor() as cursor:
-            for model in (Article, IndexEntry):
-                table = model._meta.db_table
-                cursor.execute('VACUUM ANALYSE "%s";' % table)
-                cursor.execute('REINDEX TABLE "%s";' % table)
-        for backend_name, backend in self.backends:
-            if not isinstance(backend, DatabaseSearchBackend):
-                time_it(
-                    lambda: self.unsorted_autocomplete(backend),
-                    title="Unsorted autocomplete",
-                    backend_name=backend_name,
+    def time_first_search(self, word, warm_up):
+        """
+        Times a search right after the backend started, i.e. with no searcher
+        opened yet, unless the indexes were warmed up.
+        """
+        backend = self.backend
+        backend.searcher_pool.clear()
+        if warm_up:
+            backend.warm_up([Article])
+        return time_once(lambda: list(backend.search(word, Article)[:10]))
+
+    def deep_page_cursor(self, word):
+        page = self.backend.search(word, Article).after()[:DEEP_PAGE]
+        list(page)
+        return page.next_cursor
+
+    def type_word(self, word):
+        """
+        Times the autocomplete of each prefix of a word, as sent while typing it
+        """
+        backend = self.backend
+        return [
+            time_once(lambda: list(backend.autocomplete(word[:length], Article)[:10]))
+            for length in range(2, len(word) + 1)
+        ]
+
+    def benchmark_searching(self):
+        backend = self.backend
+        words = [(word,) for word in self.corpus.query_words(self.samples)]
+        prefixes = [(word[:3],) for word, in words]
+        corpus = self.corpus
+        published_after = corpus.start_date + (corpus.end_date - corpus.start_date) / 2
+        filtered = Article.objects.filter(first_published_at__gte=published_after)
+
+        return {
+            "search": summarize(
+                self.sample(lambda w: list(backend.search(w, Article)[:10]), words)
+            ),
+            "search_unsorted": summarize(
+                self.sample(
+                    lambda w: list(
+                        backend.search(w, Article, order_by_relevance=False)[:10]
+                    ),
+                    words,
                 )
-                time_it(
-                    lambda: self.sorted_autocomplete(backend),
-                    title="Sorted autocomplete",
-                    backend_name=backend_name,
+            ),
+            "search_filtered": summarize(
+                self.sample(lambda w: list(backend.search(w, filtered)[:10]), words)
+            ),
+            "search_deep_page": summarize(
+                self.sample(
+                    lambda w: list(
+                        backend.search(w, Article)[DEEP_PAGE : DEEP_PAGE + 10]
+                    ),
+                    words,
+                )
+            ),
+            "search_deep_cursor": summarize(
+                self.sample(
+                    lambda w, c: list(backend.search(w, Article).after(c)[:10]),
+                    [(word, self.deep_page_cursor(word)) for word, in words],
+                )
+            ),
+            "search_count": summarize(
+                self.sample(lambda w: backend.search(w, Article).count(), words)
+            ),
+            "autocomplete": summarize(
+                self.sample(
+                    lambda p: list(backend.autocomplete(p, Article)[:10]), prefixes
+                )
+            ),
+            "autocomplete_typing": summarize(
+                [duration for word, in words for duration in self.type_word(word)]
+            ),
+            "first_search": summarize(
+                [self.time_first_search(word, False) for word, in words]
+            ),
+            "first_search_warmed": summarize(
+                [self.time_first_search(word, True) for word, in words]
+            ),
+        }
+
+    def benchmark_html_stripping(self):
+        """
+        Returns the sizes of indexes of all the articles, with their rich text
+        bodies indexed as raw HTML and as text.
+        """
+        sizes = {}
+        params = settings.WAGTAILSEARCH_BACKENDS[self.backend_name]
+        for strip_html in (False, True):
+            with tempfile.TemporaryDirectory() as path:
+                backend = type(self.backend)(
+                    dict(params, PATH=path, STRIP_HTML=strip_html)
+                )
+                backend.add_bulk(Article, Article.objects.all())
+                sizes[strip_html] = directory_size(path)
+        return {"raw_html_bytes": sizes[False], "text_bytes": sizes[True]}
+
+    def step(self, size):
+        self.stderr.write("Generating %s articles…" % size)
+        self.corpus.create_articles(size - Article.objects.count())
+        self.stdout.write("Testing with %s articles:" % size)
+
+        operations = self.benchmark_indexing(size)
+        operations.update(self.benchmark_searching())
+        for operation, stats in operations.items():
+            self.write_stats(operation, stats)
+
+        run = {
+            "size": size,
+            "index_size_bytes": directory_size(self.backend.path),
+            "peak_rss_kb": peak_rss_kb(),
+            "operations": operations,
+        }
+        self.stdout.write(
+            "Index size: %.1f MB, peak RSS: %s kB\n"
+            % (run["index_size_bytes"] / 1024 / 1024, run["peak_rss_kb"])
+        )
+
+        if self.html_stripping:
+            sizes = run["html_stripping"] = self.benchmark_html_stripping()
+            self.stdout.write(
+                "Index size with raw HTML: %.1f MB, with text: %.1f MB (%+.0f%%)\n"
+                % (
+                    sizes["raw_html_bytes"] / 1024 / 1024,
+                    sizes["text_bytes"] / 1024 / 1024,
+                    (sizes["text_bytes"] / sizes["raw_html_bytes"] - 1) * 100,
                 )
-            time_it(
-                lambda: self.unsorted_search(backend),
-                title="Unsorted search",
-                backend_name=backend_name,
-            )
-            time_it(
-                lambda: self.sorted_search(backend),
-                title="Sorted search",
-                backend_name=backend_name,
             )
-        print()
+        return run
 
     def clear(self):
         Article.objects.all().delete()
-        for _, backend in self.backends:
-            backend.reset_index()
+        self.backend.reset_index()
 
     @contextmanager
     def set_up(self):
-        post_delete.disconnect(post_delete_signal_handler, sender=Article)
-        post_save.disconnect(post_save_signal_handler, sender=Article)
-        self.clear()
-        try:
+        with signal_handlers_disconnected():
+            self.clear()
             yield
-        finally:
-            # self.clear()
-            post_save.connect(post_save_signal_handler, sender=Article)
-            post_delete.connect(post_delete_signal_handler, sender=Article)
 
     def handle(self, *args, **options):
-        dictionary = list(options["dictionary"])
-        while True:
-            self.word = choice(dictionary)
-            if len(self.word) >= 6:
-                break
-        self.partial_word = self.word[:3]
-        start = options["start"]
-        step_magnitude = options["step_magnitude"]
-        limit = options["limit"]
-        seed(options["seed"])
+        sizes = sorted(options["sizes"])
+        self.samples = options["samples"]
+        self.html_stripping = options["html_stripping"]
+        self.backend_name = options["backend"]
+        self.backend = get_search_backend(self.backend_name)
+        self.corpus = Corpus(options["seed"])
+
+        call_command("migrate", verbosity=0)
+
+        report = {
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "wagtail": wagtail.__version__,
+                "whoosh": whoosh.versionstring(),
+                "database": connection.vendor,
+                "backend": settings.WAGTAILSEARCH_BACKENDS[self.backend_name],
+                "seed": options["seed"],
+                "samples": self.samples,
+            },
+            "runs": [],
+        }
         with self.set_up():
-            n = start
-            while n <= limit:
-                self.step(dictionary, n - Article.objects.count())
-                n *= step_magnitude
+            for size in sizes:
+                report["runs"].append(self.step(size))
+
+        if options["output"]:
+            json.dump(report, options["output"], indent=2, default=str)
+
+        if options["compare"]:
+            regressions = list(
+                compare_reports(
+                    json.load(options["compare"]), report, options["threshold"]
+                )
+            )
+            for size, metric, before, after in regressions:
+                self.stdout.write(
+                    "Regression with %s articles: %s %.2f -> %.2f (%+.0f%%)"
+                    % (size, metric, before, after, (after / before - 1) * 100)
+                )
+            if regressions:
+                raise CommandError("%s regressions found." % len(regressions))
+            self.stdout.write("No regressions found.")
@@ -0,0 +1,469 @@
+import json
+import multiprocessing
+import sys
+import threading
+import time
+from argparse import ArgumentTypeError, FileType
+from concurrent.futures import ProcessPoolExecutor, wait
+from itertools import accumulate
+from time import perf_counter
+
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connections
+from wagtail.search.backends import get_search_backend
+from whoosh.index import TOC
+from whoosh.writing import AsyncWriter
+
+from ...benchmarking import (
+    Corpus,
+    signal_handlers_disconnected,
+    strictly_positive_int,
+    summarize,
+    weighted_choices,
+)
+from ...models import Article
+
+READ_OPERATIONS = ("search", "autocomplete")
+WRITE_OPERATIONS = ("add", "delete")
+DEFAULT_MIX = "search=6,autocomplete=4,add=3,delete=1"
+# Share of the adds which re-index an article instead of adding a new one
+UPDATE_RATIO = 0.5
+# The articles added by a writer get primary keys from (number + 1) * PK_RANGE
+PK_RANGE = 10**8
+
+
+def non_negative_int(value):
+    type_error = ArgumentTypeError("%s must be a non-negative integer." % value)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise type_error
+    if value < 0:
+        raise type_error
+    return value
+
+
+def positive_float(value):
+    type_error = ArgumentTypeError("%s must be a strictly positive number." % value)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise type_error
+    if value <= 0:
+        raise type_error
+    return value
+
+
+def operation_mix(value):
+    """
+    Parses weights such as ``search=6,autocomplete=4,add=3,delete=1``, missing
+    operations aren't run
+    """
+    mix = dict.fromkeys(READ_OPERATIONS + WRITE_OPERATIONS, 0.0)
+    for item in value.split(","):
+        operation, _, weight = item.partition("=")
+        operation = operation.strip()
+        if operation not in mix:
+            raise ArgumentTypeError("Unknown operation %s." % operation)
+        try:
+            mix[operation] = float(weight)
+        except ValueError:
+            raise ArgumentTypeError("%s must be a number." % weight)
+        if mix[operation] < 0:
+            raise ArgumentTypeError("%s must not be negative." % weight)
+    return mix
+
+
+class OperationRecorder:
+    """
+    Collects the latencies of the operations of a worker process, and counts
+    the ones which failed by exception type
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def run(self, operation, func, *args):
+        start = perf_counter()
+        try:
+            func(*args)
+        except Exception as e:
+            key = "%s: %s" % (operation, type(e).__name__)
+            self.errors[key] = self.errors.get(key, 0) + 1
+            return False
+        self.latencies.setdefault(operation, []).append(perf_counter() - start)
+        return True
+
+    def report(self, **kwargs):
+        return dict(kwargs, latencies=self.latencies, errors=self.errors)
+
+
+def start_worker(backend_name, seed, name):
+    """
+    Returns the backend and the corpus of a worker process. The searchers and
+    caches inherited from the parent process are dropped.
+    """
+    backend = get_search_backend(backend_name)
+    backend.searcher_pool.clear()
+    backend.hash_cache.clear()
+    backend.autocomplete_cache.clear()
+    corpus = Corpus(seed)
+    corpus.random.seed(name)
+    return backend, corpus
+
+
+def choose_operation(corpus, mix, operations):
+    cum_weights = list(accumulate(mix[name] for name in operations))
+    return weighted_choices(corpus.random, operations, cum_weights)[0]
+
+
+def run_reader(backend_name, seed, number, mix, stop_at):
+    backend, corpus = start_worker(backend_name, seed, "reader-%d" % number)
+    words = corpus.query_words(1000)
+    recorder = OperationRecorder()
+
+    def search(word):
+        list(backend.search(word, Article)[:10])
+
+    def autocomplete(prefix):
+        list(backend.autocomplete(prefix, Article)[:10])
+
+    while time.time() < stop_at:
+        word = corpus.random.choice(words)
+        if choose_operation(corpus, mix, READ_OPERATIONS) == "search":
+            recorder.run("search", search, word)
+        else:
+            prefix = word[: corpus.random.randint(2, len(word))]
+            recorder.run("autocomplete", autocomplete, prefix)
+    return recorder.report()
+
+
+def wait_for_async_writers():
+    """
+    Waits for the commits which AsyncWriter deferred to a thread because the
+    index was locked, returns how long it took or ``None`` if there were none
+    """
+    threads = [
+        thread for thread in threading.enumerate() if isinstance(thread, AsyncWriter)
+    ]
+    if not threads:
+        return None
+    start = perf_counter()
+    for thread in threads:
+        thread.join()
+    return perf_counter() - start
+
+
+def run_writer(backend_name, seed, number, mix, stop_at, owned_pks):
+    """
+    Adds and deletes the articles owned by a writer, returns the primary keys
+    which should be indexed or not once it is done. Articles are only written
+    to the index, so that the database isn't contended instead.
+    """
+    backend, corpus = start_worker(backend_name, seed, "writer-%d" % number)
+    recorder = OperationRecorder()
+    present = set(owned_pks)
+    absent = set()
+    lock_waits = []
+    next_pk = (number + 1) * PK_RANGE
+
+    while time.time() < stop_at:
+        operation = choose_operation(corpus, mix, WRITE_OPERATIONS)
+        if operation == "delete" and present:
+            pk = corpus.random.choice(list(present))
+            present.discard(pk)
+            if recorder.run("delete", backend.delete, Article(pk=pk)):
+                absent.add(pk)
+            # Whether a failed delete was committed is unknown
+            continue
+
+        if present and corpus.random.random() < UPDATE_RATIO:
+            pk = corpus.random.choice(list(present))
+        else:
+            pk = next_pk
+            next_pk += 1
+        article = Article(
+            pk=pk,
+            title=corpus.title(),
+            body=corpus.body(),
+            first_published_at=corpus.published_at(),
+        )
+        present.discard(pk)
+        added = recorder.run("add", backend.add, article)
+        lock_wait = wait_for_async_writers()
+        if lock_wait is not None:
+            lock_waits.append(lock_wait)
+        if added:
+            present.add(pk)
+
+    return recorder.report(
+        present=sorted(present), absent=sorted(absent), lock_waits=lock_waits
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Load tests the backend with concurrent reader and writer processes on a "
+        "generated corpus of articles, "
+        "e.g. ./manage.py loadtest --settings=tests.benchmark_settings"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            type=strictly_positive_int,
+            default=2000,
+            help="Number of articles of the corpus.",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--readers",
+            type=non_negative_int,
+            default=4,
+            help="Number of processes running searches and autocompletes.",
+        )
+        parser.add_argument(
+            "--writers",
+            type=non_negative_int,
+            default=2,
+            help="Number of processes adding and deleting articles.",
+        )
+        parser.add_argument(
+            "--duration",
+            type=positive_float,
+            default=10.0,
+            help="Duration of the load test in seconds.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=positive_float,
+            default=1.0,
+            help="Seconds between two samples of the segments of the index.",
+        )
+        parser.add_argument(
+            "--mix",
+            type=operation_mix,
+            default=operation_mix(DEFAULT_MIX),
+            help="Weights of the operations, readers pick among search and "
+            "autocomplete, writers among add and delete (default %s)." % DEFAULT_MIX,
+        )
+        parser.add_argument(
+            "--backend", default="default", help="Name of the search backend."
+        )
+        parser.add_argument(
+            "-o", "--output", type=FileType("w"), help="Write the JSON report here."
+        )
+
+    def set_up(self, size):
+        self.stderr.write("Generating %s articles…" % size)
+        with signal_handlers_disconnected():
+            Article.objects.all().delete()
+            self.corpus.create_articles(size)
+        self.backend.reset_index()
+        self.backend.add_bulk(Article, Article.objects.all())
+
+    def sample_index(self, elapsed):
+        """
+        Returns the segments and documents of the index, read from its TOC so
+        that writers aren't locked out
+        """
+        sample = {"elapsed_s": elapsed, "segments": 0, "doc_count": 0, "deleted": 0}
+        for indexname in self.backend.get_shard_names(Article):
+            try:
+                toc = TOC.read(self.backend.storage, indexname)
+            except OSError:
+                # A writer replaced the TOC in the meantime
+                return None
+            sample["segments"] += len(toc.segments)
+            for segment in toc.segments:
+                sample["doc_count"] += segment.doc_count()
+                sample["deleted"] += segment.deleted_count()
+        return sample
+
+    def process_pool(self, max_workers):
+        # Workers inherit the configured Django project by forking, which is the
+        # default on Linux before Python 3.14 but can only be asked for from 3.7
+        if sys.version_info < (3, 7):
+            return ProcessPoolExecutor(max_workers=max_workers)
+        return ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("fork")
+        )
+
+    def run_workers(self, options):
+        mix = options["mix"]
+        readers = options["readers"]
+        writers = options["writers"]
+        pks = list(Article.objects.values_list("pk", flat=True))
+        # Forked workers must open database connections of their own
+        connections.close_all()
+
+        timeline = []
+        stop_at = time.time() + options["duration"]
+        start = perf_counter()
+        with self.process_pool(readers + writers) as executor:
+            reader_futures = [
+                executor.submit(
+                    run_reader, self.backend_name, self.seed, number, mix, stop_at
+                )
+                for number in range(readers)
+            ]
+            writer_futures = [
+                executor.submit(
+                    run_writer,
+                    self.backend_name,
+                    self.seed,
+                    number,
+                    mix,
+                    stop_at,
+                    pks[number::writers],
+                )
+                for number in range(writers)
+            ]
+            pending = set(reader_futures + writer_futures)
+            while pending:
+                sample = self.sample_index(round(perf_counter() - start, 2))
+                if sample is not None:
+                    timeline.append(sample)
+                _, pending = wait(pending, timeout=options["interval"])
+        elapsed = perf_counter() - start
+        timeline.append(self.sample_index(round(elapsed, 2)))
+
+        return (
+            [future.result() for future in reader_futures],
+            [future.result() for future in writer_futures],
+            timeline,
+            elapsed,
+        )
+
+    def find_lost_writes(self, writer_results):
+        """
+        Returns the number of added articles missing from the index, and of
+        deleted articles still in it
+        """
+        indexed = set()
+        for indexname in self.backend.get_shard_names(Article):
+            index = self.backend.storage.open_index(indexname=indexname)
+            with index.searcher() as searcher:
+                indexed.update(fields["pk"] for fields in searcher.all_stored_fields())
+        missing = resurrected = 0
+        for result in writer_results:
+            missing += len({str(pk) for pk in result["present"]} - indexed)
+            resurrected += len({str(pk) for pk in result["absent"]} & indexed)
+        return missing, resurrected
+
+    def summarize_operations(self, results, elapsed):
+        samples = {}
+        errors = {}
+        for result in results:
+            for operation, latencies in result["latencies"].items():
+                samples.setdefault(operation, []).extend(latencies)
+            for key, count in result["errors"].items():
+                errors[key] = errors.get(key, 0) + count
+        operations = {}
+        for operation in READ_OPERATIONS + WRITE_OPERATIONS:
+            if samples.get(operation):
+                stats = summarize(samples[operation])
+                # Throughput of all the workers together
+                stats["throughput_per_sec"] = len(samples[operation]) / elapsed
+                operations[operation] = stats
+        return operations, errors
+
+    def write_report(self, report):
+        for operation, stats in report["operations"].items():
+            self.stdout.write(
+                "%-14s %8d ops %10.1f /s %10.2f ms p50 %10.2f ms p90 %10.2f ms p99"
+                % (
+                    operation,
+                    stats["samples"],
+                    stats["throughput_per_sec"],
+                    stats["p50_ms"],
+                    stats["p90_ms"],
+                    stats["p99_ms"],
+                )
+            )
+
+        lock_wait = report["lock_wait"]
+        if lock_wait:
+            self.stdout.write(
+                "Lock waits: %d deferred commits, %.2f ms p50, %.2f ms p99, "
+                "%.2f ms max"
+                % (
+                    lock_wait["samples"],
+                    lock_wait["p50_ms"],
+                    lock_wait["p99_ms"],
+                    lock_wait["max_ms"],
+                )
+            )
+        else:
+            self.stdout.write("Lock waits: no deferred commits")
+
+        for key, count in sorted(report["errors"].items()):
+            self.stdout.write("Failed %s: %d" % (key, count))
+        self.stdout.write(
+            "Lost writes: %(missing)d added articles missing, "
+            "%(resurrected)d deleted articles still indexed" % report["lost_writes"]
+        )
+
+        timeline = [sample for sample in report["timeline"] if sample]
+        self.stdout.write(
+            "Segments over time: %s"
+            % " ".join(str(sample["segments"]) for sample in timeline)
+        )
+        self.stdout.write(
+            "Deleted documents over time: %s"
+            % " ".join(str(sample["deleted"]) for sample in timeline)
+        )
+
+    def handle(self, *args, **options):
+        mix = options["mix"]
+        if options["readers"] + options["writers"] == 0:
+            raise CommandError("At least one reader or writer is needed.")
+        if options["readers"] and not any(mix[name] for name in READ_OPERATIONS):
+            raise CommandError("The mix has no search nor autocomplete.")
+        if options["writers"] and not any(mix[name] for name in WRITE_OPERATIONS):
+            raise CommandError("The mix has no add nor delete.")
+
+        self.seed = options["seed"]
+        self.backend_name = options["backend"]
+        self.backend = get_search_backend(self.backend_name)
+        self.corpus = Corpus(self.seed)
+
+        call_command("migrate", verbosity=0)
+        self.set_up(options["size"])
+        self.stdout.write(
+            "Load testing %s articles with %s readers and %s writers for %s s:"
+            % (
+                options["size"],
+                options["readers"],
+                options["writers"],
+                options["duration"],
+            )
+        )
+
+        reader_results, writer_results, timeline, elapsed = self.run_workers(options)
+        operations, errors = self.summarize_operations(
+            reader_results + writer_results, elapsed
+        )
+        lock_waits = [
+            duration for result in writer_results for duration in result["lock_waits"]
+        ]
+        missing, resurrected = self.find_lost_writes(writer_results)
+        report = {
+            "size": options["size"],
+            "readers": options["readers"],
+            "writers": options["writers"],
+            "mix": mix,
+            "duration_s": elapsed,
+            "operations": operations,
+            "lock_wait": summarize(lock_waits) if lock_waits else None,
+            "errors": errors,
+            "lost_writes": {"missing": missing, "resurrected": resurrected},
+            "timeline": timeline,
+        }
+        self.write_report(report)
+
+        if options["output"]:
+            json.dump(report, options["output"], indent=2)
+        if missing or resurrected:
+            raise CommandError("%s writes were lost." % (missing + resurrected))
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='first_published_at',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('project', '0002_article_first_published_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='language',
+            field=models.CharField(default='en', max_length=7),
+        ),
+    ]
@@ -1,13 +1,22 @@
-from django.db.models import Model, CharField
+from django.db.models import CharField, DateTimeField, Model
 from wagtail.core.fields import RichTextField
-from wagtail.search.index import SearchField, Indexed
+from wagtail.search.index import (
+    AutocompleteField,
+    FilterField,
+    Indexed,
+    SearchField,
+)
 
 
 class Article(Indexed, Model):
     title = CharField(max_length=200)
     body = RichTextField()
+    first_published_at = DateTimeField(null=True)
+    language = CharField(max_length=7, default="en")
 
     search_fields = [
         SearchField("title", partial_match=True, boost=2),
+        AutocompleteField("title"),
         SearchField("body"),
+        FilterField("first_published_at"),
     ]
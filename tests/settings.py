@@ -15,6 +15,7 @@ INSTALLED_APPS = [
     "wagtail.core",
     "wagtail.search",
     "wagtail.tests.search",
+    "tests.project",
     "wagtail_whoosh",
 ]
 
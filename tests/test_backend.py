@@ -1,17 +1,43 @@
 # coding: utf-8
 from __future__ import unicode_literals
 
+import asyncio
 import copy
+import datetime
+from io import StringIO
+from unittest import mock
 
+from django.apps import apps
 from django.conf import settings
-from django.test import TestCase, override_settings
+from django.core import management
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import translation
 
+from wagtail.search.backends import get_search_backend
 from wagtail.search.index import AutocompleteField
+from wagtail.search.query import MATCH_ALL
+
+from wagtail_whoosh.apps import is_management_command
+from wagtail_whoosh.backend import WhooshSearchBackend, _limit_query_terms
+from wagtail_whoosh.collectors import SearchAfterCollector
+from wagtail_whoosh.scoring import BM25F
+from wagtail_whoosh.signals import (
+    indexing_finished,
+    indexing_progress,
+    search_finished,
+)
 from wagtail.search.tests.test_backends import BackendTests
 from wagtail.tests.search import models
 
+from tests.project.models import Article
+
 from whoosh.analysis import LanguageAnalyzer
 from whoosh.analysis.ngrams import NgramFilter
+from whoosh.filedb.filestore import FileStorage
+from whoosh.query import And, Or, Prefix, Term
+from whoosh.searching import Searcher
+from whoosh.scoring import Frequency
 
 sv_search_setttings_language = copy.deepcopy(settings.WAGTAILSEARCH_BACKENDS)
 sv_search_setttings_language["default"]["LANGUAGE"] = "sv"
@@ -27,6 +53,56 @@ indexing_resources["default"]["PROCS"] = 2
 ngram_length = copy.deepcopy(settings.WAGTAILSEARCH_BACKENDS)
 ngram_length["default"]["NGRAM_LENGTH"] = (3, 9)
 
+search_concurrency = copy.deepcopy(settings.WAGTAILSEARCH_BACKENDS)
+search_concurrency["default"]["SEARCH_CONCURRENCY"] = 4
+
+instrumentation = copy.deepcopy(settings.WAGTAILSEARCH_BACKENDS)
+instrumentation["default"]["SLOW_QUERY_THRESHOLD"] = 0
+instrumentation["default"]["TIMINGS_CALLBACK"] = "tests.test_backend.record_timings"
+
+time_limit = copy.deepcopy(settings.WAGTAILSEARCH_BACKENDS)
+time_limit["default"]["SEARCH_TIME_LIMIT"] = 30
+time_limit["default"]["MAX_QUERY_TERMS"] = 2
+
+bm25f_weighting = copy.deepcopy(settings.WAGTAILSEARCH_BACKENDS)
+bm25f_weighting["default"]["BM25F"] = {
+    "B": 0.5,
+    "FIELDS": {"title": {"B": 1.0, "K1": 2.0}},
+}
+
+frequency_weighting = copy.deepcopy(settings.WAGTAILSEARCH_BACKENDS)
+frequency_weighting["default"]["WEIGHTING"] = "frequency"
+
+sharded = copy.deepcopy(settings.WAGTAILSEARCH_BACKENDS)
+sharded["default"]["SHARDS"] = 3
+sharded["default"]["SEARCH_CONCURRENCY"] = 4
+
+warm_up = copy.deepcopy(settings.WAGTAILSEARCH_BACKENDS)
+warm_up["default"]["WARM_UP"] = ["searchtests.Book"]
+warm_up["default"]["WARM_UP_BACKGROUND"] = False
+
+warm_up_database = copy.deepcopy(warm_up)
+warm_up_database["database"] = {
+    "BACKEND": "wagtail.search.backends.db",
+    "WARM_UP": True,
+    "WARM_UP_BACKGROUND": False,
+}
+
+streaming = copy.deepcopy(settings.WAGTAILSEARCH_BACKENDS)
+streaming["default"]["INDEXING_CHUNK_SIZE"] = 3
+# About the size of a few author documents
+streaming["default"]["BUFFER_MEMORY"] = 0.002
+
+localized = copy.deepcopy(settings.WAGTAILSEARCH_BACKENDS)
+localized["default"]["LANGUAGES"] = {"en": "en", "fr": "fr", "pt-BR": "pt"}
+localized["default"]["LOCALE_FIELDS"] = {"project.Article": "language"}
+
+recorded_timings = []
+
+
+def record_timings(**kwargs):
+    recorded_timings.append(kwargs)
+
 
 class TestWhooshSearchBackend(BackendTests, TestCase):
     backend_path = "wagtail_whoosh.backend"
@@ -106,3 +182,927 @@ class TestWhooshSearchBackend(BackendTests, TestCase):
 
         self.assertEquals(3, filter.min)
         self.assertEquals(9, filter.max)
+
+    @override_settings(WAGTAILSEARCH_BACKENDS=search_concurrency)
+    def test_search_concurrency(self):
+        self.setUp()
+        self.assertEqual(4, self.backend.search_concurrency)
+        results = self.backend.search("JavaScript", models.Book).annotate_score(
+            "_score"
+        )
+        self.assertUnsortedListEqual(
+            [r.title for r in results],
+            ["JavaScript: The good parts", "JavaScript: The Definitive Guide"],
+        )
+        self.assertTrue(all(r._score > 0 for r in results))
+
+        results = self.backend.search(MATCH_ALL, models.Book)
+        self.assertEqual(len(results), models.Book.objects.count())
+
+    def test_search_limit(self):
+        results = self.backend.search(MATCH_ALL, models.Book)
+        self.assertIsNone(results._get_search_limit())
+        self.assertEqual(10, results[2:10]._get_search_limit())
+
+        # Hits may be filtered out by the database, so all of them are needed
+        results = self.backend.search(
+            MATCH_ALL, models.Book.objects.filter(number_of_pages__gt=100)
+        )
+        self.assertIsNone(results[:10]._get_search_limit())
+
+        results = self.backend.search(
+            MATCH_ALL,
+            models.Book.objects.order_by("title"),
+            order_by_relevance=False,
+        )
+        self.assertIsNone(results[:10]._get_search_limit())
+
+    def test_schema_sort_columns(self):
+        schema = self.backend.build_schema(models.Book)
+        self.assertIn("number_of_pages_sort", schema)
+        self.assertIn("publication_date_sort", schema)
+        # Text is sorted by the database, following its collation
+        self.assertNotIn("title_sort", schema)
+
+    def test_order_by_sort_column(self):
+        queryset = models.Book.objects.order_by("publication_date", "-number_of_pages")
+        results = self.backend.search(MATCH_ALL, queryset, order_by_relevance=False)
+        self.assertEqual(
+            [("publication_date_sort", False), ("number_of_pages_sort", True)],
+            results[:4]._get_sort_fields(),
+        )
+        self.assertEqual(4, results[:4]._get_search_limit())
+
+        for order_by in ["number_of_pages", "-publication_date"]:
+            queryset = models.Book.objects.order_by(order_by)
+            results = self.backend.search(MATCH_ALL, queryset, order_by_relevance=False)
+            self.assertEqual(list(results[:4]), list(queryset[:4]))
+
+    def test_write_to_index_with_old_schema(self):
+        # An index built before sortable columns and content hashes were added
+        schema = copy.deepcopy(self.backend.build_schema(models.Book))
+        for name in ["number_of_pages_sort", "publication_date_sort", "content_hash"]:
+            schema.remove(name)
+        self.backend.storage.create_index(schema, indexname="searchtests.Book")
+
+        book = models.Book.objects.create(
+            title="The Old Schema",
+            publication_date=datetime.date(1999, 1, 1),
+            number_of_pages=100,
+        )
+        self.backend.add(book)
+        self.backend.add_bulk(models.Book, [book])
+        results = self.backend.search("Old", models.Book)
+        self.assertEqual([book.pk], [result.pk for result in results])
+
+        # Searches ordered by a missing column are sorted by the database, the
+        # index only holds the new book
+        queryset = models.Book.objects.order_by("number_of_pages")
+        results = self.backend.search(MATCH_ALL, queryset, order_by_relevance=False)
+        self.assertEqual([book], list(results[:1]))
+
+    def test_order_by_sort_column_with_offset(self):
+        queryset = models.Book.objects.order_by("-number_of_pages")
+        results = self.backend.search("JavaScript", queryset, order_by_relevance=False)[
+            1:3
+        ]
+        self.assertEqual(
+            list(results), list(queryset.filter(title__icontains="javascript")[1:3])
+        )
+
+    def test_search_limit_keeps_top_results(self):
+        results = self.backend.search(
+            "JavaScript Definitive", models.Book, operator="or"
+        )
+        self.assertEqual(
+            [r.title for r in results[:1]], ["JavaScript: The Definitive Guide"]
+        )
+
+    def page_by_cursor(self, results, page_size):
+        pages = []
+        cursor = None
+        while True:
+            page = results.after(cursor)[:page_size]
+            pages.append([obj.pk for obj in page])
+            cursor = page.next_cursor
+            if cursor is None:
+                return pages
+
+    def assertCursorPages(self, queryset, pages):
+        # Ties are ordered by primary key in the index but not by the database
+        pks = sum(pages, [])
+        self.assertEqual(len(set(pks)), len(pks))
+        self.assertUnsortedListEqual([book.pk for book in queryset], pks)
+        pages_by_pk = dict(queryset.values_list("pk", "number_of_pages"))
+        self.assertEqual(
+            [book.number_of_pages for book in queryset], [pages_by_pk[pk] for pk in pks]
+        )
+
+    def test_cursor_by_relevance(self):
+        results = self.backend.search("JavaScript", models.Book, operator="or")
+        pages = self.page_by_cursor(results, 2)
+        self.assertEqual([obj.pk for obj in results], sum(pages, []))
+        self.assertTrue(all(len(page) == 2 for page in pages[:-1]))
+
+    def test_cursor_with_hits_in_several_indexes(self):
+        # Programming guides are also in the index of books, with other scores
+        guides = models.ProgrammingGuide.objects.values_list("pk", flat=True)
+        results = self.backend.search(
+            "JavaScript Definitive", models.Book, operator="or"
+        )
+        pks = [book.pk for book in results]
+        self.assertTrue(set(pks) & set(guides))
+
+        for page_size in (1, 2):
+            pages = self.page_by_cursor(results, page_size)
+            cursor_pks = sum(pages, [])
+            self.assertEqual(len(set(cursor_pks)), len(cursor_pks))
+            self.assertUnsortedListEqual(pks, cursor_pks)
+
+    def test_cursor_reads_only_candidates_in_other_indexes(self):
+        guides = [
+            models.ProgrammingGuide.objects.create(
+                title="Zebra %d" % number,
+                publication_date=datetime.date(2000, 1, 1),
+                number_of_pages=number,
+                programming_language="py",
+            )
+            for number in range(50)
+        ]
+        self.backend.add_bulk(models.Book, guides)
+        self.backend.add_bulk(models.ProgrammingGuide, guides)
+        results = self.backend.search("Zebra", models.Book)
+
+        # Limit of the collector during each collect and stored fields read
+        collects = []
+        reads = []
+        collect = SearchAfterCollector.collect
+        stored_fields = Searcher.stored_fields
+
+        def record_collect(collector, sub_docnum):
+            collects.append(collector.limit)
+            return collect(collector, sub_docnum)
+
+        def record_read(searcher, docnum):
+            if collects:
+                reads.append(collects[-1])
+            return stored_fields(searcher, docnum)
+
+        with mock.patch.object(SearchAfterCollector, "collect", record_collect):
+            with mock.patch.object(Searcher, "stored_fields", record_read):
+                page = results.after()[:5]
+                self.assertEqual(5, len(page))
+                self.assertEqual(5, len(results.after(page.next_cursor)[:5]))
+
+        # The best ranks of the candidates of each page, at most 5 from the
+        # index of books and 5 from the one of guides, are looked up in both
+        # indexes without going through the 2 x 50 hits
+        for limit_by_call in (collects, reads):
+            second_pass = [limit for limit in limit_by_call if limit is None]
+            self.assertLessEqual(len(second_pass), 2 * 10 * 2)
+
+    def test_cursor_by_sort_column(self):
+        queryset = models.Book.objects.order_by("-number_of_pages")
+        results = self.backend.search(MATCH_ALL, queryset, order_by_relevance=False)
+        self.assertCursorPages(queryset, self.page_by_cursor(results, 3))
+
+        # Filters are applied by the database after the cursor
+        queryset = queryset.filter(number_of_pages__gt=300)
+        results = self.backend.search(MATCH_ALL, queryset, order_by_relevance=False)
+        self.assertCursorPages(queryset, self.page_by_cursor(results, 3))
+
+    def test_cursor_score(self):
+        results = self.backend.search("JavaScript", models.Book).annotate_score("_s")
+        page = results.after()[:2]
+        self.assertEqual([obj._s for obj in results[:2]], [obj._s for obj in page])
+
+    def test_invalid_cursor(self):
+        results = self.backend.search("JavaScript", models.Book)
+        with self.assertRaises(ValueError):
+            list(results.after("not a cursor")[:2])
+
+        queryset = models.Book.objects.order_by("number_of_pages")
+        sorted_results = self.backend.search(
+            MATCH_ALL, queryset, order_by_relevance=False
+        )
+        cursor = sorted_results.after()[:1]
+        list(cursor)
+        with self.assertRaises(ValueError):
+            list(results.after(cursor.next_cursor)[:2])
+
+    def test_cursor_unsupported_ordering(self):
+        queryset = models.Book.objects.order_by("title")
+        results = self.backend.search(MATCH_ALL, queryset, order_by_relevance=False)
+        with self.assertRaises(ValueError):
+            list(results.after()[:2])
+
+    def test_search_models(self):
+        results = self.backend.search_models(
+            "Flanagan JavaScript", [models.Author, models.Book], operator="or"
+        ).annotate_score("_score")
+        found = [(type(obj), obj.pk) for obj in results]
+        self.assertIn((models.Author, 10), found)
+        self.assertIn((models.Book, 13), found)
+        self.assertIn((models.Book, 14), found)
+        self.assertEqual(len(found), results.count())
+        # The best hit of every model has a score of 1
+        self.assertEqual(1.0, results[0]._score)
+        self.assertEqual(2, len([obj for obj in results if obj._score == 1.0]), results)
+        self.assertEqual(found[1:3], [(type(obj), obj.pk) for obj in results[1:3]])
+
+    def test_search_models_page_queries(self):
+        results = self.backend.search_models(
+            "Flanagan JavaScript", [models.Author, models.Book], operator="or"
+        )
+        # Only the objects of the page are fetched, with one query per model
+        with self.assertNumQueries(2):
+            page = list(results[:3])
+        self.assertEqual(3, len(page))
+        with self.assertNumQueries(1):
+            list(results[:1])
+
+    def test_search_models_queryset(self):
+        authors = models.Author.objects.filter(date_of_birth__isnull=False)
+        results = self.backend.search_models(
+            "Martin Tolkien Ascher Foundation",
+            [authors, models.Novel],
+            operator="or",
+        )[:10]
+        found = [(type(obj), obj.pk) for obj in results]
+        self.assertIn((models.Novel, 10), found)
+        self.assertUnsortedListEqual(
+            [1, 2], [pk for model, pk in found if model is models.Author]
+        )
+
+    def test_search_models_empty(self):
+        results = self.backend.search_models("", [models.Author, models.Book])
+        self.assertEqual([], list(results))
+        self.assertEqual(0, results.count())
+
+    def test_search_finished_signal(self):
+        received = []
+
+        def receiver(**kwargs):
+            received.append(kwargs)
+
+        search_finished.connect(receiver)
+        try:
+            list(self.backend.search("JavaScript", models.Book))
+        finally:
+            search_finished.disconnect(receiver)
+
+        self.assertEqual(1, len(received))
+        self.assertEqual(models.Book, received[0]["sender"])
+        self.assertEqual("search", received[0]["operation"])
+        phases = received[0]["timings"].phases
+        self.assertIn("parse", phases)
+        self.assertIn("search:searchtests.Book", phases)
+        self.assertIn("merge", phases)
+        self.assertIn("hydrate", phases)
+        self.assertGreaterEqual(received[0]["timings"].total, sum(phases.values()))
+
+    def test_indexing_finished_signal(self):
+        received = []
+
+        def receiver(**kwargs):
+            received.append(kwargs)
+
+        author = models.Author.objects.create(name="Mary Shelley")
+        # Changed without saving, so that the indexed document is out of date
+        author.name = "Mary Wollstonecraft Shelley"
+        indexing_finished.connect(receiver)
+        try:
+            self.backend.add(author)
+        finally:
+            indexing_finished.disconnect(receiver)
+
+        self.assertEqual(1, len(received))
+        self.assertEqual("add_item", received[0]["operation"])
+        self.assertEqual(1, received[0]["documents"])
+        self.assertEqual(
+            ["build", "lookup", "add", "commit"], list(received[0]["timings"].phases)
+        )
+
+    @override_settings(WAGTAILSEARCH_BACKENDS=streaming)
+    def test_add_items_streaming(self):
+        self.setUp()
+        progress = []
+
+        def receiver(**kwargs):
+            progress.append(kwargs)
+
+        self.backend.reset_index()
+        indexing_progress.connect(receiver)
+        try:
+            self.backend.add_bulk(models.Author, models.Author.objects.all())
+        finally:
+            indexing_progress.disconnect(receiver)
+
+        count = models.Author.objects.count()
+        self.assertEqual([3, 3, 3, 2], [chunk["documents"] for chunk in progress])
+        self.assertEqual(count, sum(chunk["documents"] for chunk in progress))
+        # Documents were committed before all of them were built
+        self.assertTrue(any(chunk["buffered_bytes"] == 0 for chunk in progress[:-1]))
+        stats = self.backend.get_index_stats("searchtests.Author")
+        self.assertEqual(count, stats["doc_count"])
+        self.assertGreater(stats["segments"], 1)
+        self.assertEqual(
+            [2], [author.pk for author in self.backend.search("Tolkien", models.Author)]
+        )
+
+    def get_generation(self, model):
+        index = self.backend.storage.open_index(indexname=model._meta.label)
+        return index.latest_generation()
+
+    def test_skip_unchanged_document(self):
+        author = models.Author.objects.create(name="Mary Shelley")
+        generation = self.get_generation(models.Author)
+
+        # The hash is read from the index
+        self.backend.hash_cache.clear()
+        self.backend.add(author)
+        self.assertEqual(generation, self.get_generation(models.Author))
+
+        # And remembered for this version of the index
+        self.assertEqual(1, len(self.backend.hash_cache))
+        self.backend.add(author)
+        self.backend.add_bulk(models.Author, [author])
+        self.assertEqual(generation, self.get_generation(models.Author))
+
+        author.name = "Mary Wollstonecraft Shelley"
+        self.backend.add_bulk(models.Author, [author])
+        self.assertEqual(generation + 1, self.get_generation(models.Author))
+        self.assertEqual(1, len(self.backend.search("Wollstonecraft", models.Author)))
+
+    def test_skip_unchanged_documents_with_one_searcher(self):
+        authors = list(models.Author.objects.all())
+        self.backend.add_bulk(models.Author, authors)
+        generation = self.get_generation(models.Author)
+
+        pool = self.backend.searcher_pool
+        with mock.patch.object(
+            pool, "versioned_searcher", wraps=pool.versioned_searcher
+        ) as versioned_searcher:
+            self.backend.add_bulk(models.Author, authors)
+        self.assertEqual(1, versioned_searcher.call_count)
+        self.assertEqual(generation, self.get_generation(models.Author))
+
+    def test_skip_unchanged_document_written_by_other_process(self):
+        author = models.Author.objects.create(name="Mary Shelley")
+        self.backend.add(author)
+        generation = self.get_generation(models.Author)
+
+        # Another process indexes a different version of the author
+        index = self.backend.storage.open_index(indexname="searchtests.Author")
+        writer = index.writer()
+        writer.update_document(pk=str(author.pk), name="Percy Shelley")
+        writer.commit()
+
+        # The remembered hash is of an older version of the index
+        self.backend.add(author)
+        self.assertEqual(generation + 2, self.get_generation(models.Author))
+        self.assertEqual(1, len(self.backend.search("Mary", models.Author)))
+
+    def test_delete_forgets_hash(self):
+        author = models.Author.objects.create(name="Mary Shelley")
+        self.backend.delete(author)
+        self.backend.add(author)
+        self.assertEqual(1, len(self.backend.search("Shelley", models.Author)))
+
+    def autocomplete_books(self, query):
+        received = []
+
+        def receiver(**kwargs):
+            received.append(kwargs["timings"].phases)
+
+        search_finished.connect(receiver)
+        try:
+            results = self.backend.autocomplete(query, models.Book)[:10]
+            books = [book.pk for book in results]
+        finally:
+            search_finished.disconnect(receiver)
+        return books, received[0]
+
+    def test_autocomplete_cache(self):
+        cache = self.backend.autocomplete_cache
+        cache.clear()
+        books, phases = self.autocomplete_books("Java")
+        self.assertIn("search:searchtests.Book", phases)
+        # The hits of each descendant index are remembered
+        self.assertEqual(3, len(cache))
+
+        # The same prefix typed again isn't searched
+        cached_books, phases = self.autocomplete_books("Java")
+        self.assertEqual(books, cached_books)
+        self.assertNotIn("search:searchtests.Book", phases)
+
+        # Searches aren't cached
+        list(self.backend.search("Java", models.Book))
+        self.assertEqual(3, len(cache))
+
+        # Hits are only reused for the version of the index they were found in
+        book = models.Book.objects.create(
+            title="Java Concurrency in Practice",
+            publication_date=datetime.date(2006, 5, 9),
+            number_of_pages=384,
+        )
+        new_books, phases = self.autocomplete_books("Java")
+        self.assertIn(book.pk, new_books)
+        self.assertIn("search:searchtests.Book", phases)
+
+    @override_settings(WAGTAILSEARCH_BACKENDS=instrumentation)
+    def test_timings_callback_and_slow_query_log(self):
+        self.setUp()
+        del recorded_timings[:]
+        with self.assertLogs("wagtail_whoosh", "WARNING") as logs:
+            list(self.backend.autocomplete("Java", models.Book))
+
+        self.assertEqual(1, len(recorded_timings))
+        self.assertEqual("autocomplete", recorded_timings[0]["operation"])
+        self.assertIn("Slow autocomplete on searchtests.Book", logs.output[0])
+
+    def test_time_limit(self):
+        results = self.backend.search("JavaScript", models.Book)
+        self.assertIsNone(results._time_limit)
+        self.assertEqual(2, len(results.time_limit(30)))
+        self.assertFalse(results.partial)
+
+        # The time limit is already over, nothing is collected
+        results = results.time_limit(0)[:10]
+        self.assertEqual([], list(results))
+        self.assertTrue(results.partial)
+
+    @override_settings(WAGTAILSEARCH_BACKENDS=time_limit)
+    def test_time_limit_settings(self):
+        self.setUp()
+        results = self.backend.search("JavaScript", models.Book)
+        self.assertEqual(30, results._time_limit)
+        self.assertIsNone(results.time_limit(None)._time_limit)
+
+        # Every results class shares the same time limit options
+        results = self.backend.search_models("JavaScript", [models.Book])
+        self.assertEqual(30, results[:1]._time_limit)
+        self.assertIsNone(results.time_limit(None)[:1]._time_limit)
+        results = self.backend.search_models("", [models.Book])
+        self.assertEqual([], list(results.time_limit(1)))
+        self.assertFalse(results.partial)
+
+        # Each word is looked up in several fields
+        results = self.backend.search("JavaScript", models.Book, operator="or")
+        self.assertEqual(2, len(results))
+        self.assertTrue(results.partial)
+
+        # Words which must all match are looked up in every field
+        results = self.backend.search(
+            "JavaScript Definitive", models.Book, operator="and"
+        )
+        self.assertEqual(
+            ["JavaScript: The Definitive Guide"], [book.title for book in results]
+        )
+        self.assertFalse(results.partial)
+
+    def test_limit_query_terms(self):
+        with self.backend.searcher_pool.searcher("searchtests.Novel") as searcher:
+            reader = searcher.reader()
+            query = Or([Term("title", word) for word in ["a", "b", "c", "d"]])
+            limited, truncated = _limit_query_terms(query, reader, 2)
+            self.assertEqual(Or([Term("title", "a"), Term("title", "b")]), limited)
+            self.assertTrue(truncated)
+
+            # Terms which must all match are kept
+            query = And([Term("title", "a"), Term("title", "b"), Term("title", "c")])
+            self.assertEqual((query, False), _limit_query_terms(query, reader, 2))
+
+            # Neither are the alternatives of terms which must match
+            query = And(
+                [
+                    Or([Term("title", "great"), Term("body", "great")]),
+                    Or([Term("title", "dickens"), Term("body", "dickens")]),
+                ]
+            )
+            for max_terms in (1, 2, 3):
+                self.assertEqual(
+                    (query, False), _limit_query_terms(query, reader, max_terms)
+                )
+
+            query = Prefix("title", "th")
+            self.assertEqual((query, False), _limit_query_terms(query, reader, 100))
+            limited, truncated = _limit_query_terms(query, reader, 2)
+            self.assertEqual(2, len(limited.subqueries))
+            self.assertTrue(truncated)
+
+    @override_settings(WAGTAILSEARCH_BACKENDS=bm25f_weighting)
+    def test_bm25f_settings(self):
+        self.setUp()
+        weighting = self.backend.weighting
+        self.assertIsInstance(weighting, BM25F)
+        self.assertEqual(0.5, weighting.B)
+        self.assertEqual({"title": 1.0}, weighting._field_B)
+        self.assertEqual({"title": 2.0}, weighting._field_K1)
+
+        results = self.backend.search("JavaScript", models.Book).annotate_score(
+            "_score"
+        )
+        self.assertEqual(2, len(results))
+        self.assertTrue(all(result._score > 0 for result in results))
+
+    @override_settings(WAGTAILSEARCH_BACKENDS=frequency_weighting)
+    def test_frequency_weighting(self):
+        self.setUp()
+        self.assertIsInstance(self.backend.weighting, Frequency)
+        results = self.backend.search("JavaScript", models.Book).annotate_score(
+            "_score"
+        )
+        self.assertEqual(2, len(results))
+
+    def test_weighting_misconfigured(self):
+        params = settings.WAGTAILSEARCH_BACKENDS["default"]
+        for options in [
+            {"WEIGHTING": "unknown"},
+            {"WEIGHTING": 42},
+            {"BM25F": {"C": 1.0}},
+            {"BM25F": {"FIELDS": {"title": {"C": 1.0}}}},
+            {"INDEXING_CHUNK_SIZE": 0},
+        ]:
+            with self.assertRaises(ImproperlyConfigured):
+                WhooshSearchBackend(dict(params, **options))
+
+        backend = WhooshSearchBackend(dict(params, WEIGHTING="whoosh.scoring.TF_IDF"))
+        self.assertEqual("TF_IDF", type(backend.weighting).__name__)
+
+    def test_match_all_unscored(self):
+        results = self.backend.search(MATCH_ALL, models.Novel)
+        self.assertFalse(results._needs_scores())
+        self.assertTrue(results.annotate_score("_score")._needs_scores())
+        self.assertEqual(models.Novel.objects.count(), len(results))
+        self.assertEqual(2, len(results[:2]))
+
+        queryset = models.Novel.objects.filter(number_of_pages__gt=300)
+        results = self.backend.search(MATCH_ALL, queryset)
+        self.assertUnsortedListEqual(
+            [novel.pk for novel in queryset], [novel.pk for novel in results]
+        )
+
+    def test_schema_cache(self):
+        schema = self.backend.build_schema(models.Novel)
+        self.assertIs(schema, self.backend.build_schema(models.Novel))
+
+        params = dict(settings.WAGTAILSEARCH_BACKENDS["default"], NGRAM_LENGTH=(3, 9))
+        self.assertIsNot(schema, WhooshSearchBackend(params).build_schema(models.Novel))
+
+    def test_warm_up(self):
+        self.backend.searcher_pool.clear()
+        self.backend.warm_up([models.Novel])
+        self.assertEqual(1, len(self.backend.searcher_pool._idle["searchtests.Novel"]))
+        self.assertNotIn("searchtests.Author", self.backend.searcher_pool._idle)
+
+    @override_settings(WAGTAILSEARCH_BACKENDS=warm_up)
+    def test_warm_up_on_ready(self):
+        self.setUp()
+        self.assertEqual(
+            {models.Book, models.Novel, models.ProgrammingGuide},
+            set(self.backend._get_warm_up_models()),
+        )
+
+        self.backend.searcher_pool.clear()
+        with mock.patch("sys.argv", ["gunicorn", "project.wsgi"]):
+            apps.get_app_config("wagtail_whoosh").ready()
+        self.assertIn("searchtests.Novel", self.backend.searcher_pool._idle)
+        self.assertNotIn("searchtests.Author", self.backend.searcher_pool._idle)
+
+    @override_settings(WAGTAILSEARCH_BACKENDS=warm_up)
+    def test_no_warm_up_in_management_commands(self):
+        self.setUp()
+        self.backend.searcher_pool.clear()
+        with mock.patch("sys.argv", ["manage.py", "update_index"]):
+            apps.get_app_config("wagtail_whoosh").ready()
+        self.assertEqual({}, self.backend.searcher_pool._idle)
+
+        self.assertTrue(is_management_command(["django-admin", "migrate"]))
+        self.assertFalse(is_management_command(["manage.py", "runserver"]))
+        self.assertFalse(is_management_command(["gunicorn", "project.wsgi"]))
+
+    @override_settings(WAGTAILSEARCH_BACKENDS=warm_up_database)
+    def test_no_warm_up_of_other_backends(self):
+        self.setUp()
+        with mock.patch("sys.argv", ["gunicorn", "project.wsgi"]):
+            with self.assertLogs("wagtail_whoosh", "WARNING") as logs:
+                apps.get_app_config("wagtail_whoosh").ready()
+        self.assertIn("'database' search backend", logs.output[0])
+
+
+@override_settings(WAGTAILSEARCH_BACKENDS=sharded)
+class TestWhooshShardedSearchBackend(BackendTests, TestCase):
+    backend_path = "wagtail_whoosh.backend"
+
+    def test_facet(self):
+        pass
+
+    def test_facet_tags(self):
+        pass
+
+    def test_facet_with_nonexistent_field(self):
+        pass
+
+    def test_incomplete_plain_text(self):
+        pass
+
+    def test_search_boosting_on_related_fields(self):
+        """
+        Each shard scores its documents with its own term statistics, which
+        are too far apart with a handful of books for this ranking to hold
+        """
+        pass
+
+    def get_shard_doc_counts(self, model):
+        counts = []
+        for indexname in self.backend.get_shard_names(model):
+            index = self.backend.storage.open_index(indexname=indexname)
+            counts.append(index.doc_count())
+        return counts
+
+    def test_shard_names(self):
+        self.assertEqual(
+            [
+                "searchtests.Novel.shard0",
+                "searchtests.Novel.shard1",
+                "searchtests.Novel.shard2",
+            ],
+            self.backend.get_shard_names(models.Novel),
+        )
+        self.assertIn("searchtests.Novel.shard2", self.backend.get_index_names())
+        self.assertNotIn("searchtests.Novel", self.backend.get_index_names())
+
+    def test_shard_stats(self):
+        stats = [
+            self.backend.get_index_stats(indexname)
+            for indexname in self.backend.get_shard_names(models.Novel)
+        ]
+        self.assertEqual(
+            models.Novel.objects.count(), sum(shard["doc_count"] for shard in stats)
+        )
+        # The rows of the model are counted once
+        self.assertEqual(
+            [models.Novel.objects.count(), None, None],
+            [shard["db_count"] for shard in stats],
+        )
+
+    def test_documents_split_between_shards(self):
+        counts = self.get_shard_doc_counts(models.Novel)
+        self.assertEqual(models.Novel.objects.count(), sum(counts))
+        self.assertGreater(len([count for count in counts if count]), 1)
+
+    def test_add_and_delete_routed_to_shard(self):
+        counts = self.get_shard_doc_counts(models.Author)
+        author = models.Author.objects.create(name="Shardy McShardface")
+        self.backend.add(author)
+        self.assertEqual(sum(counts) + 1, sum(self.get_shard_doc_counts(models.Author)))
+        self.assertEqual(1, len(self.backend.search("Shardy", models.Author)))
+
+        self.backend.delete(author)
+        self.assertEqual(counts, self.get_shard_doc_counts(models.Author))
+
+    def test_add_opens_one_shard(self):
+        author = models.Author.objects.create(name="Shardy McShardface")
+        open_index = FileStorage.open_index
+        with mock.patch.object(
+            FileStorage, "open_index", autospec=True, side_effect=open_index
+        ) as mocked:
+            self.backend.add(author)
+        opened = {call[1]["indexname"] for call in mocked.call_args_list}
+        self.assertEqual(1, len(opened))
+
+    def test_cursor_across_shards(self):
+        queryset = models.Book.objects.order_by("number_of_pages")
+        results = self.backend.search(MATCH_ALL, queryset, order_by_relevance=False)
+        cursor = None
+        pks = []
+        for _ in range(queryset.count()):
+            page = results.after(cursor)[:1]
+            pks.extend(book.pk for book in page)
+            cursor = page.next_cursor
+        self.assertUnsortedListEqual([book.pk for book in queryset], pks)
+        pages_by_pk = dict(queryset.values_list("pk", "number_of_pages"))
+        self.assertEqual(
+            [book.number_of_pages for book in queryset], [pages_by_pk[pk] for pk in pks]
+        )
+
+    def test_shards_per_model(self):
+        params = dict(sharded["default"], SHARDS={"searchtests.Novel": 2})
+        backend = WhooshSearchBackend(params)
+        self.assertEqual(2, len(backend.get_shard_names(models.Novel)))
+        self.assertEqual(["searchtests.Author"], backend.get_shard_names(models.Author))
+
+        for shards in [0, "2", {"searchtests.Novel": -1}]:
+            with self.assertRaises(ImproperlyConfigured):
+                WhooshSearchBackend(dict(params, SHARDS=shards))
+
+
+@override_settings(WAGTAILSEARCH_BACKENDS=localized)
+class TestWhooshLocaleSearchBackend(TestCase):
+    def setUp(self):
+        self.backend = get_search_backend("default")
+        self.articles = {
+            language: Article.objects.create(title=title, body=body, language=language)
+            for language, title, body in [
+                ("en", "Running shoes", "<p>Shoes of the national team</p>"),
+                ("fr", "Chanteuses", "<p>Elles chantaient une chanson nationale</p>"),
+                ("pt-br", "Cantores brasileiros", "<p>Uma canção nacional</p>"),
+                ("de", "Die Sänger", "<p>Ein nationales Lied</p>"),
+            ]
+        }
+        management.call_command(
+            "update_index", backend_name="default", stdout=StringIO()
+        )
+
+    def get_doc_counts(self):
+        counts = []
+        for indexname in self.backend.get_shard_names(Article):
+            index = self.backend.storage.open_index(indexname=indexname)
+            counts.append(index.doc_count())
+        return counts
+
+    def search(self, query, language):
+        with translation.override(language):
+            return sorted(
+                article.title for article in self.backend.search(query, Article)
+            )
+
+    def test_index_names(self):
+        self.assertEqual(
+            [
+                "project.Article",
+                "project.Article.en",
+                "project.Article.fr",
+                "project.Article.pt-br",
+            ],
+            self.backend.get_shard_names(Article),
+        )
+        self.assertEqual(
+            ["searchtests.Author"], self.backend.get_shard_names(models.Author)
+        )
+        # The German article isn't in LANGUAGES
+        self.assertEqual([1, 1, 1, 1], self.get_doc_counts())
+
+    def test_locale_stats(self):
+        for indexname in self.backend.get_shard_names(Article):
+            stats = self.backend.get_index_stats(indexname)
+            self.assertEqual(1, stats["db_count"])
+            self.assertEqual(stats["doc_count"], stats["db_count"])
+
+    def test_search_active_locale(self):
+        self.assertEqual(["Chanteuses"], self.search("chanter", "fr"))
+        self.assertEqual(["Chanteuses"], self.search("national", "fr-ca"))
+        self.assertEqual(["Running shoes"], self.search("national", "en"))
+        self.assertEqual(["Cantores brasileiros"], self.search("nacional", "pt-br"))
+        self.assertEqual([], self.search("nacional", "pt"))
+        self.assertEqual(["Die Sänger"], self.search("Lied", "de"))
+        self.assertEqual([], self.search("chanter", "en"))
+        # Every locale is searched when translations are deactivated
+        self.assertEqual(
+            ["Chanteuses", "Running shoes"],
+            self.search("national", None),
+        )
+
+    def test_locale_index_created_by_first_document(self):
+        languages = dict(localized["default"]["LANGUAGES"], es="es")
+        backend = WhooshSearchBackend(dict(localized["default"], LANGUAGES=languages))
+        backend.add_bulk(Article, Article.objects.all())
+        self.assertNotIn("project.Article.es", backend.get_index_names())
+
+        article = Article.objects.create(
+            title="Cantantes", body="<p>Una canción</p>", language="es"
+        )
+        backend.add(article)
+        self.assertIn("project.Article.es", backend.get_index_names())
+
+    def test_locale_change(self):
+        article = self.articles["fr"]
+        article.language = "en"
+        article.save()
+        self.backend.add(article)
+        self.assertEqual([1, 2, 0, 1], self.get_doc_counts())
+        self.assertEqual([], self.search("chanteuses", "fr"))
+        self.assertEqual(["Chanteuses"], self.search("chanteuses", "en"))
+
+        Article.objects.filter(language="en").update(language="fr")
+        self.backend.add_bulk(Article, Article.objects.all())
+        self.assertEqual([1, 0, 2, 1], self.get_doc_counts())
+
+        article.refresh_from_db()
+        self.backend.delete(article)
+        self.assertEqual([1, 0, 1, 1], self.get_doc_counts())
+
+    def test_shared_analyzers(self):
+        schema = self.backend.build_schema(Article, "fr")
+        analyzer = self.backend.get_analyzer("fr")
+        self.assertIs(analyzer, schema["body"].analyzer)
+        self.assertIs(
+            analyzer, self.backend.build_schema(models.Author, "fr")["name"].analyzer
+        )
+        self.assertIsNot(schema, self.backend.build_schema(Article, "en"))
+        self.assertIs(schema, self.backend.build_schema(Article, "fr"))
+        self.assertIs(
+            analyzer, WhooshSearchBackend(localized["default"]).get_analyzer("fr")
+        )
+
+    def test_languages_setting(self):
+        params = localized["default"]
+        for options in [
+            {"LANGUAGES": "fr"},
+            {"LANGUAGES": {"tlh": "klingon"}},
+            {"LOCALE_FIELDS": ["project.Article"]},
+        ]:
+            with self.assertRaises(ImproperlyConfigured):
+                WhooshSearchBackend(dict(params, **options))
+
+        backend = WhooshSearchBackend(dict(params, LANGUAGES={}))
+        self.assertEqual(["project.Article"], backend.get_shard_names(Article))
+
+
+class TestWhooshAsyncSearch(TransactionTestCase):
+    # Results are hydrated in worker threads with their own database connection,
+    # so the data has to be committed
+    def setUp(self):
+        self.backend = get_search_backend("default")
+        models.Author.objects.create(name="Charles Dickens")
+        models.Author.objects.create(name="Charlotte Bronte")
+        models.Author.objects.create(name="Jane Austen")
+        models.Book.objects.create(
+            title="Great Expectations",
+            publication_date=datetime.date(1861, 8, 1),
+            number_of_pages=544,
+        )
+        management.call_command(
+            "update_index", backend_name="default", stdout=StringIO()
+        )
+
+    def run_async(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_asearch(self):
+        async def search():
+            results = await self.backend.asearch("Charles", models.Author)
+            names = []
+            async for author in results:
+                names.append(author.name)
+            return names
+
+        self.assertEqual(self.run_async(search()), ["Charles Dickens"])
+
+    def test_aautocomplete_acount(self):
+        async def count():
+            results = await self.backend.aautocomplete("Expect", models.Book)
+            return await results.acount()
+
+        self.assertEqual(self.run_async(count()), 1)
+
+    def test_acount(self):
+        async def count():
+            results = await self.backend.asearch("Jane OR Charles", models.Author)
+            return await results.acount()
+
+        self.assertEqual(self.run_async(count()), 2)
+
+    def test_asearch_models(self):
+        async def search():
+            results = await self.backend.asearch_models(
+                "Charles Expectations", [models.Author, models.Book], operator="or"
+            )
+            names = []
+            async for obj in results:
+                names.append(str(obj))
+            return names
+
+        self.assertEqual(
+            sorted(self.run_async(search())), ["Charles Dickens", "Great Expectations"]
+        )
+
+    def test_asearch_empty_query(self):
+        async def search():
+            results = await self.backend.asearch("", models.Author)
+            authors = []
+            async for author in results:
+                authors.append(author)
+            return await results.acount(), authors
+
+        self.assertEqual(self.run_async(search()), (0, []))
+
+    def test_concurrent_asearch(self):
+        async def search(query):
+            results = await self.backend.asearch(query, models.Author)
+            return [author.name for author in await results.aresults()]
+
+        async def search_all():
+            return await asyncio.gather(
+                *[search(query) for query in ["Charles", "Jane", "Bronte"] * 4]
+            )
+
+        self.assertEqual(
+            self.run_async(search_all()),
+            [["Charles Dickens"], ["Jane Austen"], ["Charlotte Bronte"]] * 4,
+        )
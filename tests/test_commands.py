@@ -0,0 +1,177 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core import management
+from django.core.management import CommandError
+from django.test import TestCase
+
+from wagtail.search.backends import get_search_backend
+from wagtail.tests.search import models
+
+from wagtail_whoosh.backend import PK
+
+
+class TestWhooshIndexStats(TestCase):
+    fixtures = ["search"]
+
+    def setUp(self):
+        self.backend = get_search_backend("default")
+        management.call_command(
+            "update_index", backend_name="default", stdout=StringIO()
+        )
+
+    def call_command(self, *args):
+        stdout = StringIO()
+        management.call_command("whoosh_index_stats", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def get_json_stats(self, *args):
+        all_stats = json.loads(self.call_command("--json", *args))
+        return {stats["name"]: stats for stats in all_stats}
+
+    def delete_without_optimize(self, obj):
+        index = self.backend.storage.open_index(indexname=obj._meta.label)
+        with index.writer() as writer:
+            writer.delete_by_term(PK, str(obj.pk))
+
+    def test_get_index_names(self):
+        names = self.backend.get_index_names()
+        self.assertIn("searchtests.Book", names)
+        self.assertIn("searchtests.Author", names)
+
+    def test_index_stats(self):
+        stats = self.backend.get_index_stats("searchtests.Novel")
+        self.assertEqual(models.Novel.objects.count(), stats["doc_count"])
+        self.assertEqual(stats["doc_count"], stats["db_count"])
+        self.assertEqual(0, stats["deleted_count"])
+        self.assertGreater(stats["size_bytes"], 0)
+        self.assertGreaterEqual(stats["segments"], 1)
+        self.assertIsNone(stats["locked"])
+        self.assertNotIn("field_terms", stats)
+
+    def test_index_stats_locked(self):
+        stats = self.backend.get_index_stats("searchtests.Book", check_lock=True)
+        self.assertFalse(stats["locked"])
+
+        index = self.backend.storage.open_index(indexname="searchtests.Book")
+        with index.writer():
+            stats = self.backend.get_index_stats("searchtests.Book", check_lock=True)
+        self.assertTrue(stats["locked"])
+
+    def test_field_terms(self):
+        stats = self.backend.get_index_stats("searchtests.Author", field_terms=True)
+        self.assertGreater(stats["field_terms"]["name"], 0)
+        self.assertEqual(stats["doc_count"], stats["field_terms"][PK])
+
+    def test_command_table(self):
+        output = self.call_command()
+        self.assertIn("searchtests.Book", output)
+
+    def test_command_optimize_deleted_ratio(self):
+        self.delete_without_optimize(models.Author.objects.first())
+
+        stats = self.get_json_stats()["searchtests.Author"]
+        self.assertEqual(1, stats["deleted_count"])
+        self.assertNotIn("optimized", stats)
+
+        stats = self.get_json_stats("--optimize-deleted-ratio", "0.01")
+        self.assertEqual(0, stats["searchtests.Author"]["deleted_count"])
+        self.assertTrue(stats["searchtests.Author"]["optimized"])
+        self.assertNotIn("optimized", stats["searchtests.Book"])
+
+
+class TestWhooshSnapshots(TestCase):
+    fixtures = ["search"]
+
+    def setUp(self):
+        self.backend = get_search_backend("default")
+        management.call_command(
+            "update_index", backend_name="default", stdout=StringIO()
+        )
+        self.tmpdir = tempfile.mkdtemp()
+        self.archive = os.path.join(self.tmpdir, "snapshot.tar.gz")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def call_command(self, name, *args):
+        stdout = StringIO()
+        management.call_command(name, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def search_authors(self, query):
+        return [author.pk for author in self.backend.search(query, models.Author)]
+
+    def test_export_restore(self):
+        output = self.call_command("whoosh_snapshot_export", self.archive)
+        self.assertIn("Exported", output)
+
+        self.backend.reset_index()
+        self.assertEqual([], self.backend.get_index_names())
+        self.call_command("whoosh_snapshot_restore", self.archive, "--no-catch-up")
+        self.assertIn("searchtests.Novel", self.backend.get_index_names())
+        self.assertEqual([2], self.search_authors("Tolkien"))
+        stats = self.backend.get_index_stats("searchtests.Novel")
+        self.assertEqual(stats["db_count"], stats["doc_count"])
+
+    def test_catch_up(self):
+        self.call_command("whoosh_snapshot_export", self.archive)
+        # Changes made after the snapshot, e.g. on another host
+        models.Author.objects.filter(pk=2).update(name="John Ronald Reuel Tolkien")
+        models.Author.objects.filter(pk=1).delete()
+        self.backend.reset_index()
+
+        output = self.call_command("whoosh_snapshot_restore", self.archive)
+        self.assertIn("searchtests.Author: 1 documents updated, 1 deleted", output)
+        self.assertEqual([2], self.search_authors("Reuel"))
+        self.assertEqual([], self.search_authors("Martin"))
+
+        changes = self.backend.catch_up(chunk_size=1)
+        self.assertEqual((0, 0), changes["searchtests.Author"])
+
+        # Stored primary keys are compared with the database chunk by chunk
+        pks = list(models.Author.objects.values_list("pk", flat=True))
+        models.Author.objects.filter(pk__in=pks[1:]).delete()
+        changes = self.backend.catch_up(chunk_size=1)
+        self.assertEqual((0, len(pks) - 1), changes["searchtests.Author"])
+        self.assertEqual(pks[:1], self.search_authors(models.Author.objects.get().name))
+
+    def test_restore_into_mount_point(self):
+        self.call_command("whoosh_snapshot_export", self.archive)
+        self.backend.reset_index()
+        path = os.path.abspath(self.backend.path)
+        rename = os.rename
+
+        def rename_unless_mount_point(source, destination):
+            if source == path:
+                raise OSError(16, "Device or resource busy")
+            rename(source, destination)
+
+        with mock.patch("os.rename", rename_unless_mount_point):
+            self.call_command("whoosh_snapshot_restore", self.archive, "--no-catch-up")
+        self.assertEqual([2], self.search_authors("Tolkien"))
+        self.assertEqual([], [name for name in os.listdir(path) if name[0] == "."])
+
+    def test_export_while_writing(self):
+        index = self.backend.storage.open_index(indexname="searchtests.Author")
+        with index.writer() as writer:
+            writer.add_document(pk="100", name="Ursula K. Le Guin")
+            # The snapshot holds the last commit, the writer isn't blocked
+            with open(self.archive, "wb") as archive:
+                manifest = self.backend.export_snapshot(archive)
+        self.assertIn("searchtests.Author", manifest["indexes"])
+
+        with open(self.archive, "rb") as archive:
+            self.backend.restore_snapshot(archive)
+        self.assertEqual([], self.search_authors("Guin"))
+
+    def test_restore_invalid_archive(self):
+        with open(self.archive, "wb") as archive:
+            archive.write(b"not a snapshot")
+        with self.assertRaises(CommandError):
+            self.call_command("whoosh_snapshot_restore", self.archive)
+        self.assertEqual([2], self.search_authors("Tolkien"))
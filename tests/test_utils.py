@@ -0,0 +1,56 @@
+from django.test import SimpleTestCase, TestCase
+
+from wagtail.tests.search import models
+
+from wagtail_whoosh.utils import iter_chunks, strip_html
+
+
+class TestStripHtml(SimpleTestCase):
+    def test_plain_text(self):
+        self.assertEqual("a plain title", strip_html("a plain title"))
+
+    def test_rich_text(self):
+        html = (
+            '<h2>Intro</h2><p>Hello <a linktype="page" id="3">world</a>'
+            "&nbsp;&amp; <b>fri</b>ends</p>"
+            '<embed alt="a cat" embedtype="image" format="left" id="5"/>'
+            "<ul><li>one</li><li>two</li></ul>"
+        )
+        self.assertEqual(
+            ["Intro", "Hello", "world", "&", "friends", "one", "two"],
+            strip_html(html).split(),
+        )
+
+    def test_drop_scripts(self):
+        self.assertEqual(
+            ["before", "after"],
+            strip_html("<p>before</p><script>var id = 3;</script>after").split(),
+        )
+
+
+class TestIterChunks(TestCase):
+    fixtures = ["search"]
+
+    def test_iterable(self):
+        self.assertEqual([[0, 1], [2, 3], [4]], list(iter_chunks(range(5), 2)))
+        self.assertEqual([], list(iter_chunks(iter([]), 2)))
+
+    def test_queryset(self):
+        queryset = models.Author.objects.order_by("pk")
+        with self.assertNumQueries(1):
+            chunks = list(iter_chunks(queryset, 4))
+        self.assertIsNone(queryset._result_cache)
+        self.assertEqual([4, 4, 3], [len(chunk) for chunk in chunks])
+        self.assertEqual(list(queryset), sum(chunks, []))
+
+    def test_queryset_prefetch_related(self):
+        queryset = models.Book.objects.prefetch_related("authors")
+        with self.assertNumQueries(6):
+            # A query for the books of each chunk and one for their authors
+            chunks = list(iter_chunks(queryset, 5))
+        self.assertEqual([5, 5, 3], [len(chunk) for chunk in chunks])
+        with self.assertNumQueries(0):
+            authors = [list(book.authors.all()) for book in sum(chunks, [])]
+        self.assertEqual(
+            [list(book.authors.all()) for book in queryset.order_by("pk")], authors
+        )
@@ -1,2 +1,4 @@
 VERSION = (0, 2, 5)
 __version__ = ".".join(map(str, VERSION))
+
+default_app_config = "wagtail_whoosh.apps.WagtailWhooshConfig"
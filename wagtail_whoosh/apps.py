@@ -1,5 +1,83 @@
+import logging
+import os
+import sys
+import threading
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger("wagtail_whoosh")
+
+# Management commands which serve requests, the other ones don't search and
+# update_index deletes the indexes a warm-up would be opening
+SERVER_COMMANDS = ("runserver",)
+
+
+def is_management_command(argv=None):
+    """
+    Returns whether the process runs a management command other than a server
+    """
+    if argv is None:
+        argv = sys.argv
+    if len(argv) < 2:
+        return False
+    program = os.path.basename(argv[0])
+    if program not in ("manage.py", "django-admin", "django-admin.py"):
+        if not argv[0].endswith(os.path.join("django", "__main__.py")):
+            return False
+    return argv[1] not in SERVER_COMMANDS
+
+
+def is_whoosh_backend(params):
+    from wagtail.search.backends import import_backend
+
+    from .backend import WhooshSearchBackend
+
+    backend_class = import_backend(params.get("BACKEND", ""))
+    return isinstance(backend_class, type) and issubclass(
+        backend_class, WhooshSearchBackend
+    )
+
+
+def warm_up_backend(backend_name):
+    from wagtail.search.backends import get_search_backend
+
+    get_search_backend(backend_name).warm_up()
+
+
+def warm_up_backend_in_background(backend_name):
+    try:
+        warm_up_backend(backend_name)
+    except Exception:
+        logger.exception("Could not warm up the '%s' search backend", backend_name)
 
 
 class WagtailWhooshConfig(AppConfig):
     name = "wagtail_whoosh"
+
+    def ready(self):
+        backends = getattr(settings, "WAGTAILSEARCH_BACKENDS", {})
+        if not any(params.get("WARM_UP") for params in backends.values()):
+            return
+        if is_management_command():
+            return
+        for backend_name, params in backends.items():
+            if not params.get("WARM_UP"):
+                continue
+            if not is_whoosh_backend(params):
+                logger.warning(
+                    "WARM_UP is ignored for the '%s' search backend, which isn't "
+                    "a Whoosh backend",
+                    backend_name,
+                )
+                continue
+            if params.get("WARM_UP_BACKGROUND", True):
+                # Let the worker serve requests while the indexes are opened
+                threading.Thread(
+                    target=warm_up_backend_in_background,
+                    args=(backend_name,),
+                    name="wagtail-whoosh-warm-up",
+                    daemon=True,
+                ).start()
+            else:
+                warm_up_backend(backend_name)
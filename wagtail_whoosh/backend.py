@@ -1,40 +1,125 @@
+import base64
+import copy
+import datetime
+import functools
+import hashlib
+import json
+import logging
 import os
+import re
 import shutil
+import sys
+from itertools import islice
+from time import perf_counter
 from warnings import warn
 
-from django.core.exceptions import ImproperlyConfigured
-from django.db import DEFAULT_DB_ALIAS, models
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, models
 from django.db.models import Case, Q, When
+from django.utils import timezone, translation
 from django.utils.encoding import force_text
 from django.utils.module_loading import import_string
 
+from wagtail.core.fields import RichTextField, StreamField
 from wagtail.search.backends.base import (
     BaseSearchBackend,
     BaseSearchQueryCompiler,
     BaseSearchResults,
+    EmptySearchResults,
 )
 from wagtail.search.index import (
     AutocompleteField,
     FilterField,
     RelatedFields,
     SearchField,
+    class_is_indexed,
+    get_indexed_models,
 )
 from wagtail.search.query import And, Boost, MatchAll, Not, Or, PlainText
 from wagtail.search.utils import AND, OR
 
+# The modules only needed to search (query parser, collectors, sorting and
+# scoring) are imported on first use, so that workers boot faster
 from whoosh import lang
 from whoosh.analysis import analyzers
+from whoosh.columns import NumericColumn
+from whoosh.fields import COLUMN, NGRAMWORDS, STORED, TEXT, Schema
 from whoosh.fields import ID as WHOOSH_ID
-from whoosh.fields import NGRAMWORDS, TEXT, Schema
 from whoosh.filedb.filestore import FileStorage
-from whoosh.qparser import MultifieldParser
+from whoosh.index import EmptyIndexError
+from whoosh.util.times import datetime_to_long
 from whoosh.writing import AsyncWriter
 
-from .utils import get_boost, get_descendant_models, unidecode
+from .pool import (
+    get_autocomplete_cache,
+    get_executor,
+    get_hash_cache,
+    get_searcher_pool,
+)
+from .sharding import get_shard, get_shard_names, write_documents
+from .signals import indexing_finished, indexing_progress, search_finished
+from .snapshots import export_snapshot, restore_snapshot
+from .utils import (
+    Timings,
+    get_boost,
+    get_descendant_models,
+    iter_chunks,
+    peak_rss_kb,
+    strip_html,
+    unidecode,
+)
+
+logger = logging.getLogger("wagtail_whoosh")
 
 PK = "pk"
+CONTENT_HASH = "content_hash"
 AUTOCOMPLETE_SUFFIX = "_ngrams"
 FILTER_SUFFIX = "_filter"
+SORT_SUFFIX = "_sort"
+# Documents without a value are sorted last, like NULLs in PostgreSQL
+SORT_DEFAULT = 2**63 - 1
+
+TOC_FILENAME_RE = re.compile(r"^_(?P<indexname>.+)_[0-9]+\.toc$")
+
+# Schemas built for each model and schema options, shared by all backends
+_schema_cache = {}
+# Analyzers built for each language, shared by all schemas
+_analyzer_cache = {}
+
+# Index names of the documents of a model in a locale
+LOCALE_NAME = "%s.%s"
+
+
+def _call_with_db_connections(func, *args, **kwargs):
+    # Worker threads keep their own database connections, clean them up the same
+    # way Django does around a request
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def _get_language_analyzer(language):
+    """
+    Returns the analyzer of a language, the standard analyzer for ``None``.
+    Their stemmers cache the words they stem, so sharing them between fields
+    and schemas keeps the cache warm, and pickles a single analyzer in the
+    table of contents of each index.
+    """
+    analyzer = _analyzer_cache.get(language)
+    if analyzer is None:
+        if language is None:
+            analyzer = analyzers.StandardAnalyzer()
+        else:
+            analyzer = analyzers.LanguageAnalyzer(language)
+        analyzer = _analyzer_cache.setdefault(language, analyzer)
+    return analyzer
+
+
+def _normalize_locale(language_code):
+    return str(language_code).lower().replace("_", "-")
 
 
 def _get_field_mapping(field):
@@ -45,6 +130,176 @@ def _get_field_mapping(field):
     return field.field_name
 
 
+def _get_sort_type(model, field):
+    """
+    Returns "int" or "datetime" if the values of a FilterField are also stored in
+    a sortable column, so that searches ordered by this field are sorted by
+    Whoosh instead of the database.
+    """
+    if not isinstance(field, FilterField):
+        return None
+    try:
+        model_field = field.get_field(model)
+    except FieldDoesNotExist:
+        return None
+    if isinstance(
+        model_field,
+        (
+            models.AutoField,
+            models.BooleanField,
+            models.IntegerField,
+            models.NullBooleanField,
+        ),
+    ):
+        return "int"
+    if isinstance(model_field, models.DateField):
+        return "datetime"
+    return None
+
+
+def _is_rich_text(model, field):
+    """
+    Returns whether the values of a search field are HTML, which is converted to
+    text before indexing so that tags and attributes don't become terms.
+    """
+    if isinstance(field, FilterField):
+        return False
+    try:
+        model_field = field.get_field(model)
+    except FieldDoesNotExist:
+        return False
+    return isinstance(model_field, (RichTextField, StreamField))
+
+
+def _get_content_hash(document):
+    return hashlib.sha1(repr(sorted(document.items())).encode("utf-8")).hexdigest()
+
+
+def _to_sort_value(sort_type, value):
+    if value is None:
+        return None
+    if sort_type == "datetime":
+        if not isinstance(value, datetime.datetime):
+            value = datetime.datetime.combine(value, datetime.time.min)
+        elif timezone.is_aware(value):
+            value = timezone.make_naive(value, timezone.utc)
+        return datetime_to_long(value)
+    return int(value)
+
+
+def _get_document_size(document):
+    # Estimated memory used by a built document, its dict and its values
+    return sys.getsizeof(document) + sum(
+        sys.getsizeof(value) for value in document.values()
+    )
+
+
+def _limit_query_terms(query, reader, max_terms):
+    """
+    Returns the Whoosh query with about ``max_terms`` terms, and whether some
+    terms were dropped. Prefix and wildcard queries are expanded against the
+    index, and their expansions over the limit are dropped. Only the optional
+    alternatives of the query, i.e. the ones of ``Or`` queries which aren't
+    part of an ``And``, a ``Not``, etc., are dropped, so that the documents
+    found always match the whole query.
+    """
+    from whoosh.query import Or as WHOOSH_OR
+    from whoosh.query import Term as WHOOSH_TERM
+    from whoosh.query.terms import MultiTerm
+
+    remaining = [max_terms]
+    truncated = [False]
+
+    def limit(q, optional):
+        if isinstance(q, MultiTerm):
+            expanded = iter(q._btexts(reader))
+            # At least one expansion is kept, dropping them all would drop a
+            # required term
+            btexts = list(islice(expanded, max(remaining[0], 1)))
+            remaining[0] -= len(btexts)
+            if next(expanded, None) is None:
+                # All the expansions fit, keep the query as it is
+                return q
+            truncated[0] = True
+            field = reader.schema[q.fieldname]
+            return WHOOSH_OR(
+                [
+                    WHOOSH_TERM(q.fieldname, field.from_bytes(btext), boost=q.boost)
+                    for btext in btexts
+                ]
+            )
+        if isinstance(q, WHOOSH_TERM):
+            remaining[0] -= 1
+            return q
+        if isinstance(q, WHOOSH_OR) and optional:
+            subqueries = []
+            for subquery in q.subqueries:
+                if remaining[0] <= 0 and subqueries:
+                    truncated[0] = True
+                    break
+                subqueries.append(limit(subquery, True))
+            q = copy.copy(q)
+            q.subqueries = subqueries
+            return q
+        # Every term under an And, a Not, etc. may be needed to match
+        return q.apply(lambda subquery: limit(subquery, False))
+
+    return limit(query, True).normalize(), truncated[0]
+
+
+def _encode_cursor(ordering, rank):
+    data = json.dumps([ordering, list(rank)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(ordering, cursor):
+    """
+    Returns the rank encoded in a cursor, which must come from results with the
+    same ordering.
+    """
+    try:
+        cursor_ordering, rank = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        )
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError("Invalid cursor %r" % cursor)
+    if cursor_ordering != ordering:
+        raise ValueError("The cursor %r was made for another ordering" % cursor)
+    return tuple(rank)
+
+
+def _merge_ranks(all_results):
+    """
+    Returns ``{pk: rank}`` from the ``(pk, rank)`` hits of several indexes,
+    keeping the best (lowest) rank of documents found in more than one index.
+    """
+    rank_map = {}
+    for index_results in all_results:
+        for pk, rank in index_results:
+            if pk not in rank_map or rank < rank_map[pk]:
+                rank_map[pk] = rank
+    return rank_map
+
+
+def _merge_scores(all_results):
+    """
+    Returns ``{pk: score}`` from the ``(pk, score)`` hits of several indexes,
+    keeping the best score of documents found in more than one index.
+    """
+    score_map = {}
+    for index_results in all_results:
+        for pk, score in index_results:
+            if pk not in score_map or score_map[pk] < score:
+                score_map[pk] = score
+    return score_map
+
+
+class MissingSortColumn(Exception):
+    """
+    Raised when an index was built before its sortable columns were added
+    """
+
+
 class WhooshModelIndex:
     def __init__(self, backend, model, db_alias=None):
         self.backend = backend
@@ -54,19 +309,64 @@ class WhooshModelIndex:
             db_alias = DEFAULT_DB_ALIAS
         self.db_alias = db_alias
         self.rebuilding = False
+        # Set by the rebuilder to write the shards in parallel processes
+        self.rebuild_executor = None
         self.name = model._meta.label
-        self.model_index = self._open_model_index()
+        self.locale_field = backend.get_locale_field(model)
+        self.locales = backend.get_locales(model)
+        # The ``(index name, locale)`` of each shard of each locale
+        self.index_names = [
+            (indexname, locale)
+            for locale in self.locales
+            for indexname in backend.get_shard_names(model, [locale])
+        ]
+        # Indexes are opened by position when a document is routed to them, so
+        # that writing one document doesn't open every shard of every locale
+        self._indexes = {}
 
-    def _open_model_index(self):
+    def _get_index(self, position, create=True):
+        """
+        Returns the index at ``position``, created if it doesn't exist unless
+        ``create`` is false, then ``None`` is returned.
+        """
+        index = self._indexes.get(position)
+        if index is not None:
+            return index
+        indexname, locale = self.index_names[position]
         storage = self.backend.storage
-        model = self.model
-        label = model._meta.label
-        # if index doesn't exist, create
-        if not storage.index_exists(indexname=label):
-            schema = self.backend.build_schema(self.model)
-            storage.create_index(schema, indexname=label)
-        # return the opened index to work with
-        return storage.open_index(indexname=label)
+        try:
+            index = storage.open_index(indexname=indexname)
+        except EmptyIndexError:
+            if not create:
+                return None
+            schema = self.backend.build_schema(self.model, locale)
+            index = storage.create_index(schema, indexname=indexname)
+        self._indexes[position] = index
+        return index
+
+    def _get_indexes(self):
+        """
+        Yields the position and index of every existing index
+        """
+        for position in range(len(self.index_names)):
+            index = self._get_index(position, create=False)
+            if index is not None:
+                yield position, index
+
+    def _get_locale(self, item):
+        if self.locale_field is None:
+            return None
+        value = getattr(item, self.locale_field)
+        if callable(value):
+            value = value()
+        # e.g. a foreign key to a model of locales
+        value = getattr(value, "language_code", value)
+        return self.backend.get_locale(value)
+
+    def _get_position(self, pk, locale=None):
+        # The shards of each locale follow each other, in the order of self.locales
+        shards = len(self.index_names) // len(self.locales)
+        return self.locales.index(locale) * shards + get_shard(pk, shards)
 
     def _close_model_index(self):
         self.backend.storage.close()
@@ -81,11 +381,15 @@ class WhooshModelIndex:
         return args
 
     def add_model(self, model):
-        # Adding done on initialisation
+        # The indexes of the other locales are created by their first document
+        for position, (_, locale) in enumerate(self.index_names):
+            if locale is None:
+                self._get_index(position)
         self._close_model_index()
 
     def refresh(self):
-        self.model_index.refresh()
+        for position, index in list(self._indexes.items()):
+            self._indexes[position] = index.refresh()
 
     def prepare_value(self, value):
         if not value:
@@ -103,9 +407,16 @@ class WhooshModelIndex:
     def _get_document_fields(self, model, item):
         for field in model.get_search_fields():
             if isinstance(field, (SearchField, FilterField, AutocompleteField)):
-                yield _get_field_mapping(field), self.prepare_value(
-                    field.get_value(item)
-                )
+                value = field.get_value(item)
+                text = self.prepare_value(value)
+                if self.backend.strip_html and _is_rich_text(model, field):
+                    text = strip_html(text)
+                yield _get_field_mapping(field), text
+                sort_type = _get_sort_type(model, field)
+                if sort_type is not None:
+                    sort_value = _to_sort_value(sort_type, value)
+                    if sort_value is not None:
+                        yield field.field_name + SORT_SUFFIX, sort_value
             if isinstance(field, RelatedFields):
                 value = field.get_value(item)
                 if isinstance(value, (models.Manager, models.QuerySet)):
@@ -125,35 +436,260 @@ class WhooshModelIndex:
         doc_fields = dict(self._get_document_fields(model, item))
         document = {PK: force_text(item.pk)}
         document.update(doc_fields)
+        document[CONTENT_HASH] = _get_content_hash(document)
         return document
 
+    def _prepare_document(self, index, doc):
+        # Indexes created before some fields were added, e.g. content hashes or
+        # sortable columns, get them when they are rebuilt
+        schema = index.schema
+        if all(name in schema for name in doc):
+            return doc
+        return {name: value for name, value in doc.items() if name in schema}
+
+    def _remove_unchanged(self, index, docs):
+        """
+        Returns the documents the index doesn't already hold exactly, looked up
+        with one searcher. The hashes read from the index are remembered, but
+        only trusted while the index is at the version they were read from, as
+        other processes write to it too.
+        """
+        if CONTENT_HASH not in index.schema:
+            return docs
+        hash_cache = self.backend.hash_cache
+        pool = self.backend.searcher_pool
+        with pool.versioned_searcher(index.indexname) as (version, searcher):
+            if searcher is None:
+                return docs
+            # The version may not tell the index apart from a rebuilt one
+            trusted = version[1] is not None
+            changed = []
+            for doc in docs:
+                key = (index.indexname, doc[PK])
+                if trusted and hash_cache.get(key) == (version, doc[CONTENT_HASH]):
+                    continue
+                stored = searcher.document(**{PK: doc[PK]})
+                if stored is None or stored.get(CONTENT_HASH) != doc[CONTENT_HASH]:
+                    changed.append(doc)
+                elif trusted:
+                    hash_cache.set(key, (version, doc[CONTENT_HASH]))
+            return changed
+
     def add_item(self, item):
         model = self.model
-        doc = self._create_document(model, item)
-        index = self.model_index
+        timings = Timings()
+        with timings.phase("build"):
+            doc = self._create_document(model, item)
+        position = self._get_position(item.pk, self._get_locale(item))
+        index = self._get_index(position)
+        with timings.phase("lookup"):
+            unchanged = not self._remove_unchanged(index, [doc])
+        if unchanged:
+            # Only fields which aren't indexed changed, don't commit a segment
+            self._close_model_index()
+            self.backend._report_indexing(model, "add_item", 0, timings)
+            return
         writer = AsyncWriter(index, writerargs=self._writer_args())
-        writer.update_document(**doc)
-        writer.commit()
+        with timings.phase("add"):
+            writer.update_document(**self._prepare_document(index, doc))
+        with timings.phase("commit"):
+            writer.commit()
+        self._delete_moved(position, [doc], timings)
         self._close_model_index()
+        self.backend._report_indexing(model, "add_item", 1, timings)
 
-    def add_items(self, item_model, items):
+    def add_items(self, item_model, items, chunk_size=None):
+        """
+        Indexes items streamed in chunks of ``chunk_size`` (INDEXING_CHUNK_SIZE
+        by default), querysets aren't loaded at once.
+
+        Built documents are buffered until their estimated size reaches
+        BUFFER_MEMORY, then written and committed as a segment, so that the
+        memory used doesn't grow with the number of items.
+        """
+        try:
+            return self._add_items(items, chunk_size)
+        except BaseException:
+            # The rebuilder isn't finished when indexing fails, its worker
+            # processes would be left running
+            self.stop_rebuild_executor()
+            raise
+
+    def _add_items(self, items, chunk_size):
         model = self.model
-        index = self.model_index
-        writer = AsyncWriter(index, writerargs=self._writer_args())
-        for item in items:
-            doc = self._create_document(model, item)
-            writer.update_document(**doc)
-        writer.commit()
+        backend = self.backend
+        timings = Timings()
+        shards = [[] for _ in self.index_names]
+        buffered = 0
+        documents = 0
+        if chunk_size is None:
+            chunk_size = backend.indexing_chunk_size
+        for chunk in iter_chunks(items, chunk_size):
+            start = perf_counter()
+            with timings.phase("build"):
+                for item in chunk:
+                    doc = self._create_document(model, item)
+                    position = self._get_position(item.pk, self._get_locale(item))
+                    shards[position].append(doc)
+                    buffered += _get_document_size(doc)
+            if backend.buffer_memory is not None and buffered >= backend.buffer_memory:
+                documents += self._write_shards(shards, timings)
+                shards = [[] for _ in self.index_names]
+                buffered = 0
+            backend._report_indexing_progress(
+                model, len(chunk), perf_counter() - start, buffered
+            )
+        documents += self._write_shards(shards, timings)
         self._close_model_index()
+        backend._report_indexing(model, "add_items", documents, timings)
+        return documents
+
+    def _write_shards(self, shards, timings):
+        """
+        Writes the documents of each shard, returns how many were written
+        """
+        if self.rebuild_executor is not None:
+            with timings.phase("add"):
+                self._write_shards_in_parallel(shards)
+            return sum(len(docs) for docs in shards)
+
+        documents = 0
+        for position, docs in enumerate(shards):
+            if not docs:
+                continue
+            index = self._get_index(position)
+            if not self.rebuilding:
+                # The indexes are empty while rebuilding
+                with timings.phase("lookup"):
+                    docs = self._remove_unchanged(index, docs)
+            if not docs:
+                continue
+            writer = AsyncWriter(index, writerargs=self._writer_args())
+            with timings.phase("add"):
+                for doc in docs:
+                    writer.update_document(**self._prepare_document(index, doc))
+            with timings.phase("commit"):
+                writer.commit()
+            if not self.rebuilding:
+                self._delete_moved(position, docs, timings)
+            documents += len(docs)
+        return documents
+
+    def _delete_moved(self, position, docs, timings):
+        """
+        Deletes the documents just written to the index at ``position`` from the
+        indexes of the other locales, which hold them if the locale of their
+        object changed
+        """
+        if len(self.locales) == 1:
+            return
+        shards = len(self.index_names) // len(self.locales)
+        # A primary key is in the same shard of every locale
+        for other in range(position % shards, len(self.index_names), shards):
+            if other == position:
+                continue
+            index = self._get_index(other, create=False)
+            if index is None:
+                continue
+            with timings.phase("lookup"):
+                with self.backend.searcher_pool.searcher(index.indexname) as searcher:
+                    moved = searcher and [
+                        doc[PK]
+                        for doc in docs
+                        if searcher.document_number(**{PK: doc[PK]}) is not None
+                    ]
+            if not moved:
+                continue
+            writer = AsyncWriter(index)
+            with timings.phase("delete"):
+                for pk in moved:
+                    writer.delete_by_term(PK, pk)
+                    self.backend.hash_cache.pop((index.indexname, pk))
+            with timings.phase("commit"):
+                writer.commit()
+
+    def stop_rebuild_executor(self):
+        if self.rebuild_executor is not None:
+            self.rebuild_executor.shutdown()
+            self.rebuild_executor = None
+
+    def _write_shards_in_parallel(self, shards):
+        # Each worker already writes a shard of its own, so the writers don't
+        # start processes of their own (PROCS)
+        writerargs = {"limitmb": self.backend.memory}
+        futures = [
+            self.rebuild_executor.submit(
+                write_documents,
+                self.backend.path,
+                self._get_index(position).indexname,
+                docs,
+                writerargs,
+            )
+            for position, docs in enumerate(shards)
+            if docs
+        ]
+        for future in futures:
+            future.result()
 
     def delete_item(self, obj):
-        index = self.model_index
+        timings = Timings()
+        position = self._get_position(obj.pk, self._get_locale(obj))
+        index = self._get_index(position, create=False)
+        if index is None:
+            # Nothing was ever written to the index of its locale
+            self.backend._report_indexing(self.model, "delete_item", 0, timings)
+            return
         writer = index.writer()
-        writer.delete_by_term(PK, str(obj.pk))
-        writer.commit()
+        with timings.phase("delete"):
+            writer.delete_by_term(PK, str(obj.pk))
+            self.backend.hash_cache.pop((index.indexname, str(obj.pk)))
+        with timings.phase("commit"):
+            writer.commit()
         # TODO: do this in other method
-        index.optimize()
+        with timings.phase("optimize"):
+            index.optimize()
         self._close_model_index()
+        self.backend._report_indexing(self.model, "delete_item", 1, timings)
+
+    def delete_missing(self, queryset, chunk_size=None):
+        """
+        Deletes the documents whose row isn't in ``queryset`` anymore, returns
+        how many were deleted. The stored primary keys of each index are
+        compared with the database in chunks of ``chunk_size``
+        (INDEXING_CHUNK_SIZE by default).
+        """
+        if chunk_size is None:
+            chunk_size = self.backend.indexing_chunk_size
+        timings = Timings()
+        deleted = 0
+        for _, index in self._get_indexes():
+            writer = None
+            with index.searcher() as searcher:
+                stored_pks = (fields[PK] for fields in searcher.all_stored_fields())
+                for chunk in iter_chunks(stored_pks, chunk_size):
+                    with timings.phase("lookup"):
+                        existing = {
+                            force_text(pk)
+                            for pk in queryset.filter(pk__in=chunk).values_list(
+                                "pk", flat=True
+                            )
+                        }
+                        missing = [pk for pk in chunk if pk not in existing]
+                    if not missing:
+                        continue
+                    if writer is None:
+                        writer = index.writer()
+                    with timings.phase("delete"):
+                        for pk in missing:
+                            writer.delete_by_term(PK, pk)
+                            self.backend.hash_cache.pop((index.indexname, pk))
+                    deleted += len(missing)
+            if writer is not None:
+                with timings.phase("commit"):
+                    writer.commit()
+        self._close_model_index()
+        self.backend._report_indexing(self.model, "delete_missing", deleted, timings)
+        return deleted
 
     def __str__(self):
         return self.name
@@ -224,8 +760,20 @@ class WhooshSearchQueryCompiler(BaseSearchQueryCompiler):
             % self.query.__class__.__name__
         )
 
-    def get_whoosh_query(self):
-        parser = MultifieldParser(self.field_names, self.schema)
+    def get_whoosh_query(self, schema=None):
+        """
+        Parses the query with the analyzers of ``schema``, e.g. the one of the
+        searched index, defaults to the schema of the model.
+        """
+        from whoosh.qparser import MultifieldParser
+        from whoosh.query import Every
+
+        if isinstance(self.query, MatchAll):
+            # Matches documents without any term in the searched fields too
+            return Every()
+        if schema is None:
+            schema = self.schema
+        parser = MultifieldParser(self.field_names, schema)
         return parser.parse(self._build_query_string())
 
     def _process_lookup(self, field, lookup, value):
@@ -313,9 +861,71 @@ class WhooshAutocompleteQueryCompiler(WhooshSearchQueryCompiler):
             yield _get_field_mapping(field)
 
 
-class WhooshSearchResults(BaseSearchResults):
+class WhooshResultsMixin:
+    """
+    Time limit and async API shared by the results classes of the backend
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._time_limit = getattr(self.backend, "search_time_limit", None)
+        # Set when the time limit ran out or a query had too many terms
+        self.partial = False
+
+    def _clone(self):
+        return self._copy_options(super()._clone())
+
+    def _copy_options(self, new):
+        new._time_limit = self._time_limit
+        return new
+
+    def time_limit(self, seconds):
+        """
+        Returns the best results found within ``seconds``, ``None`` for no limit
+        """
+        clone = self._clone()
+        clone._time_limit = seconds
+        return clone
+
+    async def aresults(self):
+        return await self.backend._run_in_executor(self.results)
+
+    async def acount(self):
+        return await self.backend._run_in_executor(self.count)
+
+    def __aiter__(self):
+        return WhooshAsyncResultsIterator(self)
+
+
+class WhooshSearchResults(WhooshResultsMixin, BaseSearchResults):
     supports_facet = False
 
+    def __init__(self, backend, query_compiler, prefetch_related=None):
+        super().__init__(backend, query_compiler, prefetch_related=prefetch_related)
+        self._paginate_by_cursor = False
+        self._after = None
+        # Set when results are paginated by cursor and there may be more
+        self.next_cursor = None
+
+    def _clone(self):
+        new = super()._clone()
+        new._paginate_by_cursor = self._paginate_by_cursor
+        new._after = self._after
+        return new
+
+    def after(self, cursor=None):
+        """
+        Returns the results ranked after ``cursor``, the ``next_cursor`` of the
+        previous page, or the first page for ``None``. Slice the results to set
+        the page size, ``next_cursor`` is set once they are evaluated.
+
+        Results must be ordered by relevance or by sortable columns.
+        """
+        clone = self._clone()
+        clone._paginate_by_cursor = True
+        clone._after = cursor
+        return clone
+
     def _new_query_compiler(self, model):
         qc = self.query_compiler
         if isinstance(qc, WhooshAutocompleteQueryCompiler):
@@ -334,51 +944,326 @@ class WhooshSearchResults(BaseSearchResults):
             backend=self.backend,
         )
 
+    def _is_unfiltered_slice(self):
+        # The database won't discard any hit through queryset filters
+        qc = self.query_compiler
+        return self.stop is not None and not qc.queryset.query.has_filters()
+
+    def _get_sort_fields(self):
+        """
+        Returns ``[(column name, reverse)]`` when Whoosh can pick the page of
+        results ordered by ``order_by`` itself, ``None`` otherwise.
+        """
+        qc = self.query_compiler
+        if qc.order_by_relevance:
+            return None
+        if not (self._is_unfiltered_slice() or self._paginate_by_cursor):
+            return None
+        order_by = list(qc._get_order_by())
+        if not order_by:
+            return None
+        for descendant in get_descendant_models(qc.queryset.model):
+            for _, field in order_by:
+                if _get_sort_type(descendant, field) is None:
+                    return None
+        return [
+            (field.field_name + SORT_SUFFIX, reverse) for reverse, field in order_by
+        ]
+
+    def _get_search_limit(self):
+        """
+        Returns how many hits each index needs to return, or ``None`` for all.
+
+        Only the top hits are needed when results are ordered by relevance or
+        by sortable columns, and the database won't discard any of them.
+        """
+        if not self._is_unfiltered_slice():
+            return None
+        if self.query_compiler.order_by_relevance or self._get_sort_fields():
+            return self.stop
+        return None
+
+    def _needs_scores(self):
+        """
+        Scores are only needed to order by relevance or to annotate them,
+        all the documents matched by ``MatchAll`` have the same score.
+        """
+        qc = self.query_compiler
+        if self._score_field:
+            return True
+        return qc.order_by_relevance and not isinstance(qc.query, MatchAll)
+
+    def _collect(self, searcher, query, limit, sortedby, deadline, collector=None):
+        from whoosh.collectors import TimeLimitCollector
+        from whoosh.searching import TimeLimit
+
+        from .collectors import LimitedUnsortedCollector
+
+        if collector is None:
+            scored = self._needs_scores()
+            if not scored and not sortedby and limit is not None:
+                # Any ``limit`` matches will do
+                collector = LimitedUnsortedCollector(limit)
+            else:
+                collector = searcher.collector(
+                    limit=limit, sortedby=sortedby, scored=scored
+                )
+        if deadline is not None:
+            time_left = deadline - perf_counter()
+            if time_left <= 0:
+                self.partial = True
+                return None
+            # The alarm signal only works in the main thread, the timer is checked
+            # between each document collected instead
+            collector = TimeLimitCollector(
+                collector, timelimit=time_left, use_alarm=False
+            )
+        try:
+            searcher.search_with_collector(
+                query,
+                collector,
+                context=searcher.context(weighting=self.backend.weighting),
+            )
+        except TimeLimit:
+            # Keep the best hits collected so far
+            self.partial = True
+        return collector.results()
+
+    def _get_autocomplete_cache_key(
+        self, query_compiler, label, version, limit, sort_fields
+    ):
+        """
+        Returns the key of the hits of an autocomplete query in an index, or
+        ``None`` when they aren't cached.
+        """
+        if not isinstance(query_compiler, WhooshAutocompleteQueryCompiler):
+            return None
+        if self.backend.autocomplete_cache.maxsize <= 0:
+            return None
+        if self._paginate_by_cursor:
+            return None
+        if version[1] is None:
+            # The version may not tell the index apart from a rebuilt one
+            return None
+        # Hits are only valid for the version of the index they were found in
+        return (
+            label,
+            version,
+            tuple(query_compiler.field_names),
+            query_compiler._build_query_string(),
+            limit,
+            tuple(sort_fields or ()),
+            self._needs_scores(),
+        )
+
+    def _search_index(
+        self,
+        target,
+        limit,
+        timings,
+        sort_fields=None,
+        deadline=None,
+        after=None,
+        pks=None,
+    ):
+        descendant, label = target
+        pool = self.backend.searcher_pool
+        with pool.versioned_searcher(label) as (version, searcher):
+            if searcher is None:
+                return []
+            with timings.phase("parse"):
+                query_compiler = self._new_query_compiler(descendant)
+                cache_key = self._get_autocomplete_cache_key(
+                    query_compiler, label, version, limit, sort_fields
+                )
+            if cache_key is not None:
+                hits = self.backend.autocomplete_cache.get(cache_key)
+                if hits is not None:
+                    return list(hits)
+
+            hits = self._search_opened_index(
+                searcher,
+                query_compiler,
+                label,
+                limit,
+                timings,
+                sort_fields=sort_fields,
+                deadline=deadline,
+                after=after,
+                pks=pks,
+            )
+            if cache_key is not None and not self.partial:
+                self.backend.autocomplete_cache.set(cache_key, tuple(hits))
+            return hits
+
+    def _search_opened_index(
+        self,
+        searcher,
+        query_compiler,
+        label,
+        limit,
+        timings,
+        sort_fields=None,
+        deadline=None,
+        after=None,
+        pks=None,
+    ):
+        with timings.phase("parse"):
+            # The indexes of each locale stem their words differently
+            query = query_compiler.get_whoosh_query(searcher.schema)
+            max_terms = self.backend.max_query_terms
+            if max_terms is not None:
+                query, truncated = _limit_query_terms(
+                    query, searcher.reader(), max_terms
+                )
+                if truncated:
+                    self.partial = True
+        with timings.phase("search:%s" % label):
+            if self._paginate_by_cursor:
+                return self._search_after(
+                    searcher, query, label, limit, sort_fields, deadline, after, pks
+                )
+            if not sort_fields:
+                hits = self._collect(searcher, query, limit, None, deadline)
+                if hits is None:
+                    return []
+                # Unscored hits keep the order they were collected in
+                return [(hit[PK], hit.score or 0.0) for hit in hits]
+
+            if any(name not in searcher.schema for name, _ in sort_fields):
+                raise MissingSortColumn(label)
+            from whoosh.sorting import FieldFacet, MultiFacet
+
+            facet = MultiFacet(
+                [FieldFacet(name, reverse=reverse) for name, reverse in sort_fields]
+            )
+            hits = self._collect(searcher, query, limit, facet, deadline)
+            if hits is None or not hits.scored_length():
+                return []
+            # Return the sort keys instead of the scores to merge the indexes
+            columns = [
+                searcher.reader().column_reader(name, translate=False)
+                for name, _ in sort_fields
+            ]
+            return [
+                (hit[PK], tuple(column[hit.docnum] for column in columns))
+                for hit in hits
+            ]
+
+    def _search_after(
+        self, searcher, query, label, limit, sort_fields, deadline, after, pks=None
+    ):
+        """
+        Returns the ``(pk, rank)`` of the ``limit`` hits ranked after ``after``,
+        among the documents with these ``pks`` if given
+        """
+        from whoosh.query import Or as WHOOSH_OR
+        from whoosh.query import Require
+        from whoosh.query import Term as WHOOSH_TERM
+
+        from .collectors import SearchAfterCollector
+
+        if sort_fields and any(name not in searcher.schema for name, _ in sort_fields):
+            raise MissingSortColumn(label)
+        if pks is not None:
+            # Only the documents matching both are collected, scored by the query
+            query = Require(query, WHOOSH_OR([WHOOSH_TERM(PK, pk) for pk in pks]))
+        collector = SearchAfterCollector(
+            PK, limit=limit, after=after, sort_fields=sort_fields
+        )
+        return self._collect(searcher, query, limit, None, deadline, collector) or []
+
+    def _search_descendants(
+        self,
+        descendants,
+        limit,
+        timings,
+        sort_fields=None,
+        deadline=None,
+        after=None,
+        pks=None,
+    ):
+        # Each shard is searched on its own, its top hits are merged with the
+        # hits of the other shards like the ones of other descendant models
+        targets = [
+            (descendant, indexname)
+            for descendant in descendants
+            for indexname in self.backend.get_search_shard_names(descendant)
+        ]
+        concurrency = self.backend.search_concurrency
+        search = functools.partial(
+            self._search_index,
+            limit=limit,
+            timings=timings,
+            sort_fields=sort_fields,
+            deadline=deadline,
+            after=after,
+            pks=pks,
+        )
+        if concurrency > 1 and len(targets) > 1:
+            return list(get_executor("fan-out", concurrency).map(search, targets))
+        return [search(target) for target in targets]
+
     def _do_search(self):
+        qc = self.query_compiler
+        timings = Timings()
+        try:
+            return self._do_timed_search(timings)
+        finally:
+            self.backend._report_search(qc.queryset.model, qc, timings)
+
+    def _do_timed_search(self, timings):
         # Probably better way to get the model
         qc = self.query_compiler
         model = qc.queryset.model
 
-        results = []
         score_map = {}
 
         descendants = get_descendant_models(model)
-        for descendant in descendants:
-            label = descendant._meta.label
-            if not self.backend.storage.index_exists(indexname=label):
-                continue
-            index = self.backend.storage.open_index(indexname=label)
-            query_compiler = self._new_query_compiler(descendant)
-            query = query_compiler.get_whoosh_query()
-            with index.searcher() as searcher:
-                descendant_results = searcher.search(query, limit=None)
-                for result in descendant_results:
-                    results.append(result)
-                    pk = result[PK]
-                    # Add to the score map, or update if higher value
-                    if pk not in score_map or score_map[pk] < result.score:
-                        score_map[pk] = result.score
+        sort_fields = self._get_sort_fields()
+        limit = self._get_search_limit()
+        deadline = None
+        if self._time_limit is not None:
+            deadline = perf_counter() + self._time_limit
+        self.partial = False
+        self.next_cursor = None
+        if self._paginate_by_cursor:
+            return self._do_search_after(timings, descendants, sort_fields, deadline)
+        try:
+            all_results = self._search_descendants(
+                descendants, limit, timings, sort_fields=sort_fields, deadline=deadline
+            )
+        except MissingSortColumn:
+            # Let the database sort until the index is rebuilt
+            sort_fields = limit = None
+            all_results = self._search_descendants(
+                descendants, limit, timings, deadline=deadline
+            )
 
         self.backend.storage.close()
 
-        django_ids = [
-            r[0]
-            for r in sorted(
-                score_map.items(), key=lambda pk_score: pk_score[1], reverse=True
-            )
-        ]
+        with timings.phase("merge"):
+            if sort_fields:
+                django_ids = self._merge_sorted(all_results, sort_fields)
+            else:
+                score_map = _merge_scores(all_results)
+                django_ids = [
+                    r[0]
+                    for r in sorted(
+                        score_map.items(),
+                        key=lambda pk_score: pk_score[1],
+                        reverse=True,
+                    )
+                ]
         if not django_ids:
             return []
 
-        if qc.order_by_relevance:
-            # Retrieve the results from the db, but preserve the order by score
-            preserved_order = Case(
-                *[When(pk=pk, then=pos) for pos, pk in enumerate(django_ids)]
-            )
-            results = qc.queryset.filter(pk__in=django_ids).order_by(preserved_order)
-        else:
-            results = qc.queryset.filter(pk__in=django_ids)
-        results = results.distinct()[self.start : self.stop]
+        with timings.phase("hydrate"):
+            if qc.order_by_relevance or sort_fields:
+                results = self._hydrate(django_ids)
+            else:
+                results = qc.queryset.filter(pk__in=django_ids)
+                results = list(results.distinct()[self.start : self.stop])
 
         # Add score annotations if required
         if self._score_field:
@@ -386,6 +1271,135 @@ class WhooshSearchResults(BaseSearchResults):
                 setattr(obj, self._score_field, score_map.get(str(obj.pk)))
         return results
 
+    def _hydrate(self, django_ids):
+        # Retrieve the results from the db, but preserve the order of the ids
+        preserved_order = Case(
+            *[When(pk=pk, then=pos) for pos, pk in enumerate(django_ids)]
+        )
+        results = self.query_compiler.queryset.filter(pk__in=django_ids)
+        return list(
+            results.order_by(preserved_order).distinct()[self.start : self.stop]
+        )
+
+    def _do_search_after(self, timings, descendants, sort_fields, deadline):
+        qc = self.query_compiler
+        if not (qc.order_by_relevance or sort_fields):
+            raise ValueError(
+                "Cursor pagination needs results ordered by relevance or by "
+                "sortable columns"
+            )
+        ordering = "relevance" if qc.order_by_relevance else sort_fields
+        # Tuples are turned into lists by JSON
+        ordering = json.loads(json.dumps(ordering))
+        after = None
+        if self._after is not None:
+            after = _decode_cursor(ordering, self._after)
+
+        # Only the hits of the page are collected, also when the database
+        # filters the results: more hits are collected until the page is full
+        limit = self.stop
+        while True:
+            all_results, rank_map = self._search_ranks(
+                descendants, limit, timings, sort_fields, deadline, after
+            )
+            with timings.phase("merge"):
+                # An index which returned ``limit`` hits may hold more, ranked
+                # after its last one, only the hits ranked before are complete
+                last_ranks = [
+                    index_results[-1][1]
+                    for index_results in all_results
+                    if limit is not None and len(index_results) >= limit
+                ]
+                horizon = min(last_ranks) if last_ranks else None
+                django_ids = sorted(
+                    (
+                        pk
+                        for pk, rank in rank_map.items()
+                        if horizon is None or rank <= horizon
+                    ),
+                    key=rank_map.get,
+                )
+            results = []
+            if django_ids:
+                with timings.phase("hydrate"):
+                    results = self._hydrate(django_ids)
+            if horizon is None or len(results) >= self.stop - self.start:
+                break
+            # Hits found in several indexes, on previous pages or filtered out by
+            # the database were dropped, the next ones may make it into the page
+            limit *= 2
+        self.backend.storage.close()
+        if not results:
+            return []
+
+        if self.stop is not None and len(results) == self.stop - self.start:
+            self.next_cursor = _encode_cursor(ordering, rank_map[str(results[-1].pk)])
+        if self._score_field:
+            for obj in results:
+                rank = rank_map[str(obj.pk)]
+                score = -rank[0] if qc.order_by_relevance else None
+                setattr(obj, self._score_field, score)
+        return results
+
+    def _search_ranks(self, descendants, limit, timings, sort_fields, deadline, after):
+        """
+        Returns the hits of each index ranked after ``after``, and ``{pk: rank}``
+        """
+        try:
+            all_results = self._search_descendants(
+                descendants,
+                limit,
+                timings,
+                sort_fields=sort_fields,
+                deadline=deadline,
+                after=after,
+            )
+        except MissingSortColumn as e:
+            raise ValueError(
+                "Cursor pagination needs the sort columns of %s, run update_index" % e
+            )
+        with timings.phase("merge"):
+            rank_map = _merge_ranks(all_results)
+        if len(descendants) < 2 or not rank_map:
+            return all_results, rank_map
+
+        # The index of a model also holds the objects of its descendants, scored
+        # differently than in their own indexes. Each object is ranked at its best
+        # rank in any index, the ones whose best rank is before ``after`` were on
+        # a previous page. Only the documents of these objects are collected.
+        best_results = self._search_descendants(
+            descendants,
+            None,
+            timings,
+            sort_fields=sort_fields,
+            deadline=deadline,
+            pks=set(rank_map),
+        )
+        with timings.phase("merge"):
+            for pk, rank in _merge_ranks(best_results).items():
+                if pk not in rank_map:
+                    continue
+                if after is not None and rank <= after:
+                    del rank_map[pk]
+                elif rank < rank_map[pk]:
+                    rank_map[pk] = rank
+        return all_results, rank_map
+
+    def _merge_sorted(self, all_results, sort_fields):
+        hits = [hit for descendant_results in all_results for hit in descendant_results]
+        # Sorting by each key from the last one keeps the previous orders of ties
+        for position in reversed(range(len(sort_fields))):
+            hits.sort(
+                key=lambda hit: hit[1][position], reverse=sort_fields[position][1]
+            )
+        django_ids = []
+        seen = set()
+        for pk, _ in hits:
+            if pk not in seen:
+                seen.add(pk)
+                django_ids.append(pk)
+        return django_ids
+
     def _do_count(self):
         return len(self._do_search())
 
@@ -394,6 +1408,170 @@ class WhooshSearchResults(BaseSearchResults):
         super().facet(field_name)
 
 
+class WhooshMultiModelSearchResults(WhooshResultsMixin, BaseSearchResults):
+    """
+    Results of one search over several unrelated models, ranked together.
+
+    The indexes of all the models are searched in one pass. The scores of each
+    model are divided by its best score, since indexes with different term
+    statistics give scores which can't be compared, and only the requested page
+    of results is fetched from the database, with one query per model.
+    """
+
+    supports_facet = False
+
+    def __init__(self, backend, model_results, prefetch_related=None):
+        super().__init__(backend, None, prefetch_related=prefetch_related)
+        self.model_results = model_results
+
+    def _clone(self):
+        new = self.__class__(
+            self.backend, self.model_results, prefetch_related=self.prefetch_related
+        )
+        new.start = self.start
+        new.stop = self.stop
+        new._score_field = self._score_field
+        return self._copy_options(new)
+
+    def _search_target(self, target, timings, deadline):
+        results, index_target = target
+        queryset = results.query_compiler.queryset
+        # Filtered out hits are only known once the database is queried
+        limit = None if queryset.query.has_filters() else self.stop
+        return results._search_index(
+            index_target, limit=limit, timings=timings, deadline=deadline
+        )
+
+    def _rank(self, timings):
+        """
+        Returns ``[(normalized score, score, model position, pk)]``, best first
+        """
+        deadline = None
+        if self._time_limit is not None:
+            deadline = perf_counter() + self._time_limit
+        # The results of each model are searched from threads and flag partial
+        # searches, the ones of other clones must not be touched
+        model_results = [results._clone() for results in self.model_results]
+        targets = [
+            (results, (descendant, indexname))
+            for results in model_results
+            for descendant in get_descendant_models(
+                results.query_compiler.queryset.model
+            )
+            for indexname in self.backend.get_search_shard_names(descendant)
+        ]
+        search = functools.partial(
+            self._search_target, timings=timings, deadline=deadline
+        )
+        concurrency = self.backend.search_concurrency
+        if concurrency > 1 and len(targets) > 1:
+            all_results = list(
+                get_executor("fan-out", concurrency).map(search, targets)
+            )
+        else:
+            all_results = [search(target) for target in targets]
+        self.backend.storage.close()
+        self.partial = any(results.partial for results in model_results)
+
+        with timings.phase("merge"):
+            score_maps = []
+            for results in model_results:
+                score_maps.append(
+                    _merge_scores(
+                        hits
+                        for (target_results, _), hits in zip(targets, all_results)
+                        if target_results is results
+                    )
+                )
+
+        with timings.phase("filter"):
+            for position, results in enumerate(model_results):
+                queryset = results.query_compiler.queryset
+                score_map = score_maps[position]
+                if score_map and queryset.query.has_filters():
+                    kept = queryset.filter(pk__in=list(score_map)).values_list(
+                        "pk", flat=True
+                    )
+                    score_maps[position] = {str(pk): score_map[str(pk)] for pk in kept}
+
+        with timings.phase("merge"):
+            ranked = []
+            for position, score_map in enumerate(score_maps):
+                best = max(score_map.values(), default=0.0)
+                for pk, score in score_map.items():
+                    normalized = score / best if best > 0 else 0.0
+                    ranked.append((normalized, score, position, pk))
+            # Ties are ranked by raw score, then by model in the order given
+            ranked.sort(key=lambda hit: (-hit[0], -hit[1], hit[2], hit[3]))
+        return ranked
+
+    def _hydrate(self, ranked, timings):
+        with timings.phase("hydrate"):
+            pks_by_position = {}
+            for _, _, position, pk in ranked:
+                pks_by_position.setdefault(position, []).append(pk)
+            objs = {}
+            for position, pks in pks_by_position.items():
+                queryset = self.model_results[position].query_compiler.queryset
+                for obj in queryset.filter(pk__in=pks):
+                    objs[position, str(obj.pk)] = obj
+
+        results = []
+        for normalized, _, position, pk in ranked:
+            # Skip objects deleted since they were indexed
+            obj = objs.get((position, pk))
+            if obj is None:
+                continue
+            if self._score_field:
+                setattr(obj, self._score_field, normalized)
+            results.append(obj)
+        return results
+
+    def _report(self, timings):
+        self.backend._report_search(None, self.model_results[0].query_compiler, timings)
+
+    def _do_search(self):
+        timings = Timings()
+        try:
+            ranked = self._rank(timings)[self.start : self.stop]
+            return self._hydrate(ranked, timings)
+        finally:
+            self._report(timings)
+
+    def _do_count(self):
+        timings = Timings()
+        try:
+            return len(self._rank(timings)[self.start : self.stop])
+        finally:
+            self._report(timings)
+
+
+class WhooshEmptySearchResults(WhooshResultsMixin, EmptySearchResults):
+    # Nothing to search, no thread is needed
+    async def aresults(self):
+        return []
+
+    async def acount(self):
+        return 0
+
+
+class WhooshAsyncResultsIterator:
+    def __init__(self, search_results):
+        self.search_results = search_results
+        self._iterator = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._iterator is None:
+            self._iterator = iter(await self.search_results.aresults())
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
 class WhooshSearchRebuilder:
     def __init__(self, model_index):
         self.model_index = model_index
@@ -413,10 +1591,24 @@ class WhooshSearchRebuilder:
             # we change flag so index directory would be only deleted one time when run update_index
             self.model_index.backend.recreate_path_already = True
 
-        self.model_index.model_index = self.model_index._open_model_index()
-        return self.model_index
+            self.model_index.backend.searcher_pool.clear()
+            self.model_index.backend.hash_cache.clear()
+            self.model_index.backend.autocomplete_cache.clear()
+
+        model_index = self.model_index
+        # The indexes opened before were deleted
+        model_index._indexes = {}
+        shards = len(model_index.index_names)
+        if shards > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            model_index.rebuild_executor = ProcessPoolExecutor(
+                max_workers=min(shards, os.cpu_count() or 1)
+            )
+        return model_index
 
     def finish(self):
+        self.model_index.stop_rebuild_executor()
         self.model_index.refresh()
 
 
@@ -436,6 +1628,17 @@ class WhooshSearchBackend(BaseSearchBackend):
         self.processors = params.get("PROCS", 1)
         self.memory = params.get("MEMORY", 128)
         self.ngram_length = params.get("NGRAM_LENGTH", (2, 8))
+        self.search_threads = params.get("SEARCH_THREADS", 4)
+        self.hash_cache_size = params.get("HASH_CACHE_SIZE", 1000)
+        self.autocomplete_cache_size = params.get("AUTOCOMPLETE_CACHE_SIZE", 256)
+        buffer_memory = params.get("BUFFER_MEMORY", 256)
+        self.buffer_memory = None if buffer_memory is None else buffer_memory * 1024**2
+        self.search_concurrency = params.get("SEARCH_CONCURRENCY", 1)
+        self.slow_query_threshold = params.get("SLOW_QUERY_THRESHOLD")
+        self.search_time_limit = params.get("SEARCH_TIME_LIMIT")
+        self.max_query_terms = params.get("MAX_QUERY_TERMS")
+        self.strip_html = params.get("STRIP_HTML", True)
+        self.warm_up_models = params.get("WARM_UP", False)
         # Flag for rebuilder, we only want the index folder emptied by the
         # first WhooshSearchRebuilder ran
         self.recreate_path_already = False
@@ -474,6 +1677,101 @@ class WhooshSearchBackend(BaseSearchBackend):
                     '"whoosh.analysis.analyzers.Analyzer", found %s' % type(analyzer),
                 )
 
+        languages = params.get("LANGUAGES", {})
+        if not isinstance(languages, dict):
+            raise ImproperlyConfigured(
+                "Wagtail Whoosh Backend languages: Expected a dict, found %r"
+                % languages,
+            )
+        # Whoosh language of each locale, None when it isn't stemmed
+        self.languages = {}
+        for locale, language in languages.items():
+            if language is not None and language not in lang.languages:
+                raise ImproperlyConfigured(
+                    "Wagtail Whoosh Backend: Language %s could not be loaded"
+                    % language,
+                )
+            self.languages[_normalize_locale(locale)] = language
+
+        locale_fields = params.get("LOCALE_FIELDS", {})
+        if not isinstance(locale_fields, dict):
+            raise ImproperlyConfigured(
+                "Wagtail Whoosh Backend locale fields: Expected a dict, found %r"
+                % locale_fields,
+            )
+        self.locale_fields = dict(locale_fields)
+
+        from whoosh.scoring import WeightingModel
+
+        from .scoring import WEIGHTING_MODELS, build_weighting
+
+        weighting = params.get("WEIGHTING", "bm25f")
+        if isinstance(weighting, str) and weighting in WEIGHTING_MODELS:
+            try:
+                self.weighting = build_weighting(weighting, params.get("BM25F"))
+            except ValueError as e:
+                raise ImproperlyConfigured("Wagtail Whoosh Backend: %s" % e)
+        else:
+            if isinstance(weighting, str):
+                try:
+                    weighting = import_string(weighting)
+                except ImportError:
+                    raise ImproperlyConfigured(
+                        "Wagtail Whoosh Backend: Weighting %s could not be loaded"
+                        % weighting,
+                    )
+            if isinstance(weighting, type) and issubclass(weighting, WeightingModel):
+                weighting = weighting()
+            if not isinstance(weighting, WeightingModel):
+                raise ImproperlyConfigured(
+                    "Wagtail Whoosh Backend weighting: Expected one of %s, a string or "
+                    'subclass of "whoosh.scoring.WeightingModel", found %s'
+                    % (", ".join(WEIGHTING_MODELS), type(weighting)),
+                )
+            self.weighting = weighting
+
+        shards = params.get("SHARDS", 1)
+        # Number of shards of the models missing from a SHARDS dict
+        self.default_shards = 1
+        self.shards = {}
+        if isinstance(shards, dict):
+            self.shards = dict(shards)
+        else:
+            self.default_shards = shards
+        for count in [self.default_shards] + list(self.shards.values()):
+            if not isinstance(count, int) or count < 1:
+                raise ImproperlyConfigured(
+                    "Wagtail Whoosh Backend shards: Expected a positive integer, "
+                    "found %r" % count,
+                )
+
+        chunk_size = params.get("INDEXING_CHUNK_SIZE", 1000)
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ImproperlyConfigured(
+                "Wagtail Whoosh Backend indexing chunk size: Expected a positive "
+                "integer, found %r" % chunk_size,
+            )
+        self.indexing_chunk_size = chunk_size
+
+        self.timings_callback = None
+        timings_callback = params.get("TIMINGS_CALLBACK")
+        if timings_callback:
+            if isinstance(timings_callback, str):
+                try:
+                    self.timings_callback = import_string(timings_callback)
+                except ImportError:
+                    raise ImproperlyConfigured(
+                        "Wagtail Whoosh Backend: Timings callback %s could not be loaded"
+                        % timings_callback,
+                    )
+            elif callable(timings_callback):
+                self.timings_callback = timings_callback
+            else:
+                raise ImproperlyConfigured(
+                    "Wagtail Whoosh Backend timings callback: Expected string or "
+                    "callable, found %s" % type(timings_callback),
+                )
+
     def check_storage(self):
         # Make sure the index is there.
         if self.use_file_storage and not os.path.exists(self.path):
@@ -487,12 +1785,50 @@ class WhooshSearchBackend(BaseSearchBackend):
 
         if self.use_file_storage:
             self.storage = FileStorage(self.path)
+            self.searcher_pool = get_searcher_pool(
+                self.path, max_idle=self.search_threads
+            )
+            self.hash_cache = get_hash_cache(self.path, maxsize=self.hash_cache_size)
+            self.autocomplete_cache = get_autocomplete_cache(
+                self.path, maxsize=self.autocomplete_cache_size
+            )
 
     def reset_index(self):
+        self.searcher_pool.clear()
+        self.hash_cache.clear()
+        self.autocomplete_cache.clear()
         shutil.rmtree(self.path)
         os.makedirs(self.path)
         self.check_storage()
 
+    def get_shard_names(self, model, locales=None):
+        """
+        Returns the names of the indexes the documents of a model are split into,
+        only the ones of ``locales`` when given
+        """
+        label = model._meta.label
+        shards = self.shards.get(label, self.default_shards)
+        if locales is None:
+            locales = self.get_locales(model)
+        names = []
+        for locale in locales:
+            name = label if locale is None else LOCALE_NAME % (label, locale)
+            names.extend(get_shard_names(name, shards))
+        return names
+
+    def get_search_shard_names(self, model):
+        """
+        Returns the names of the indexes searched for a model, the ones of the
+        active language when its documents are split by locale
+        """
+        if self.get_locale_field(model) is None:
+            return self.get_shard_names(model)
+        language_code = translation.get_language()
+        if language_code is None:
+            # Translations are deactivated, e.g. in management commands
+            return self.get_shard_names(model)
+        return self.get_shard_names(model, [self.get_locale(language_code)])
+
     def get_index_for_model(self, model, db_alias=None):
         return WhooshModelIndex(self, model, db_alias)
 
@@ -511,6 +1847,381 @@ class WhooshSearchBackend(BaseSearchBackend):
     def delete(self, obj):
         self.get_index_for_object(obj).delete_item(obj)
 
+    ################################################################################
+    #  Locales
+    ################################################################################
+
+    def get_locale_field(self, model):
+        """
+        Returns the attribute holding the locale of the objects of a model, set
+        for the model or one of its parents in LOCALE_FIELDS, or ``None`` when
+        its documents aren't split by locale
+        """
+        if not self.languages:
+            return None
+        for klass in [model] + model._meta.get_parent_list():
+            field = self.locale_fields.get(klass._meta.label)
+            if field:
+                return field
+        return None
+
+    def get_locales(self, model):
+        """
+        Returns the locales the documents of a model are split by, ``None`` is
+        the one of the objects whose locale isn't in LANGUAGES
+        """
+        if self.get_locale_field(model) is None:
+            return [None]
+        return [None] + sorted(self.languages)
+
+    def get_locale(self, language_code):
+        """
+        Returns the locale of LANGUAGES a language code belongs to, e.g. "fr"
+        for "fr-ca" unless it has one of its own, or ``None``
+        """
+        if language_code is None:
+            return None
+        language_code = _normalize_locale(language_code)
+        for locale in [language_code, language_code.split("-")[0]]:
+            if locale in self.languages:
+                return locale
+        return None
+
+    def get_analyzer(self, locale=None):
+        """
+        Returns the analyzer of the text fields of the indexes of a locale, the
+        stemmer of its language or else the one of LANGUAGE or ANALYZER
+        """
+        language = self.languages.get(locale)
+        if language is None:
+            if self.analyzer is not None:
+                return self.analyzer
+            language = self.language
+        return _get_language_analyzer(language)
+
+    ################################################################################
+    #  Index statistics
+    ################################################################################
+
+    def get_index_names(self):
+        """
+        Returns the names of the indexes in PATH, i.e. the labels of the models
+        or of their shards
+        """
+        names = set()
+        for filename in self.storage:
+            match = TOC_FILENAME_RE.match(filename)
+            if match:
+                names.add(match.group("indexname"))
+        return sorted(names)
+
+    def _get_index_files(self, indexname):
+        toc_re = re.compile(r"^_%s_[0-9]+\.toc$" % re.escape(indexname))
+        segment_re = re.compile(r"^%s_[0-9a-z]+\." % re.escape(indexname))
+        for filename in self.storage:
+            if toc_re.match(filename) or segment_re.match(filename):
+                yield filename
+
+    def _is_index_locked(self, index):
+        # Whoosh can only tell whether the lock is held by taking it. It is held
+        # for an instant, but a writer asking for it at that very moment without
+        # a timeout (e.g. delete_item) fails with a LockError
+        lock = index.lock("WRITELOCK")
+        if lock.acquire(blocking=False):
+            lock.release()
+            return False
+        return True
+
+    def _get_index_origin(self, indexname):
+        """
+        Returns the model, locale and shard position of an index name, or
+        ``None`` if it isn't the index of an indexed model
+        """
+        for model in get_indexed_models():
+            for locale in self.get_locales(model):
+                names = self.get_shard_names(model, [locale])
+                if indexname in names:
+                    return model, locale, names.index(indexname)
+        return None
+
+    def _count_locale(self, model, queryset, locale):
+        locale_field = self.get_locale_field(model)
+        try:
+            field = model._meta.get_field(locale_field)
+            lookup = locale_field
+            if field.is_relation:
+                field.related_model._meta.get_field("language_code")
+                lookup += "__language_code"
+        except FieldDoesNotExist:
+            # The locale isn't stored in a field the database can group by
+            return None
+        counts = queryset.order_by().values_list(lookup).annotate(models.Count("pk"))
+        return sum(
+            count for value, count in counts if self.get_locale(value) == locale
+        )
+
+    def _get_db_count(self, indexname):
+        origin = self._get_index_origin(indexname)
+        if origin is None:
+            # The model doesn't exist anymore
+            return None
+        model, locale, shard = origin
+        if shard:
+            # The rows of a sharded model are counted once, on its first shard
+            return None
+        queryset = model.get_indexed_objects()
+        if self.get_locale_field(model) is None:
+            return queryset.count()
+        return self._count_locale(model, queryset, locale)
+
+    def get_index_stats(self, indexname, field_terms=False, check_lock=False):
+        """
+        Returns the health statistics of an index as a dict. Counting the terms of
+        each field reads the whole term dictionary, so it is only done on demand.
+
+        Checking whether a writer holds the lock takes it for an instant, which
+        makes a writer asking for it at the same moment fail, so ``locked`` is
+        ``None`` unless ``check_lock`` is set.
+        """
+        index = self.storage.open_index(indexname=indexname)
+        with index.reader() as reader:
+            doc_count = reader.doc_count()
+            doc_count_all = reader.doc_count_all()
+            if field_terms:
+                terms = {
+                    fieldname: sum(1 for _ in reader.lexicon(fieldname))
+                    for fieldname, field in index.schema.items()
+                    if field.indexed
+                }
+
+        stats = {
+            "name": indexname,
+            "generation": index.latest_generation(),
+            "segments": len(index._segments()),
+            "doc_count": doc_count,
+            "deleted_count": doc_count_all - doc_count,
+            "deleted_ratio": (
+                (doc_count_all - doc_count) / doc_count_all if doc_count_all else 0.0
+            ),
+            "db_count": self._get_db_count(indexname),
+            "size_bytes": sum(
+                self.storage.file_length(filename)
+                for filename in self._get_index_files(indexname)
+            ),
+            "last_modified": index.last_modified(),
+            "locked": self._is_index_locked(index) if check_lock else None,
+        }
+        if field_terms:
+            stats["field_terms"] = terms
+        return stats
+
+    def optimize_index(self, indexname):
+        """
+        Merges all the segments of an index and purges its deleted documents
+        """
+        self.storage.open_index(indexname=indexname).optimize()
+
+    ################################################################################
+    #  Snapshots
+    ################################################################################
+
+    def export_snapshot(self, fileobj):
+        """
+        Writes the last commit of every index to ``fileobj`` as a gzipped tar
+        archive, returns the manifest of the snapshot
+        """
+        created_at = timezone.now().isoformat()
+        return export_snapshot(
+            self.storage, self.get_index_names(), fileobj, created_at
+        )
+
+    def restore_snapshot(self, fileobj):
+        """
+        Replaces all the indexes by the ones of a snapshot, returns its manifest.
+        Use ``catch_up`` to index the changes made since the snapshot.
+        """
+        self.searcher_pool.clear()
+        manifest = restore_snapshot(fileobj, self.path)
+        self.searcher_pool.clear()
+        self.hash_cache.clear()
+        self.autocomplete_cache.clear()
+        self.check_storage()
+        return manifest
+
+    def catch_up(self, since=None, modified_field=None, chunk_size=None):
+        """
+        Updates the indexes with the rows changed since they were built, and
+        returns ``{model label: (documents written, documents deleted)}``.
+
+        Documents are written only when their content hash changed. When the
+        models have a ``modified_field``, only the rows modified after ``since``
+        are indexed again, rows deleted since are always looked for. Rows and
+        indexed primary keys are streamed in chunks of ``chunk_size``,
+        INDEXING_CHUNK_SIZE by default.
+        """
+        changes = {}
+        for model in get_indexed_models():
+            index = self.get_index_for_model(model)
+            queryset = model.get_indexed_objects().order_by("pk")
+            deleted = index.delete_missing(queryset, chunk_size=chunk_size)
+
+            if since is not None and modified_field is not None:
+                try:
+                    model._meta.get_field(modified_field)
+                except FieldDoesNotExist:
+                    pass
+                else:
+                    queryset = queryset.filter(**{modified_field + "__gte": since})
+            written = index.add_items(model, queryset, chunk_size=chunk_size)
+            changes[model._meta.label] = (written, deleted)
+        return changes
+
+    ################################################################################
+    #  Instrumentation
+    ################################################################################
+
+    def _report(self, signal, model, operation, timings, **kwargs):
+        timings.stop()
+        signal.send(
+            sender=model, backend=self, operation=operation, timings=timings, **kwargs
+        )
+        if self.timings_callback is not None:
+            self.timings_callback(
+                model=model, operation=operation, timings=timings, **kwargs
+            )
+
+    def _report_search(self, model, query_compiler, timings):
+        if isinstance(query_compiler, WhooshAutocompleteQueryCompiler):
+            operation = "autocomplete"
+        else:
+            operation = "search"
+        self._report(
+            search_finished, model, operation, timings, query=query_compiler.query
+        )
+        threshold = self.slow_query_threshold
+        if threshold is not None and timings.total >= threshold:
+            logger.warning(
+                "Slow %s on %s took %.3fs: %r (%s)",
+                operation,
+                "several models" if model is None else model._meta.label,
+                timings.total,
+                query_compiler.query,
+                timings,
+            )
+
+    def _report_indexing(self, model, operation, documents, timings):
+        self._report(indexing_finished, model, operation, timings, documents=documents)
+
+    def _report_indexing_progress(self, model, documents, duration, buffered_bytes):
+        peak = peak_rss_kb()
+        indexing_progress.send(
+            sender=model,
+            backend=self,
+            documents=documents,
+            duration=duration,
+            buffered_bytes=buffered_bytes,
+            peak_rss_kb=peak,
+        )
+        logger.debug(
+            "Built %d %s documents in %.3fs (%.0f/s), %d kB buffered, peak RSS %s kB",
+            documents,
+            model._meta.label,
+            duration,
+            documents / duration if duration else 0,
+            buffered_bytes // 1024,
+            peak,
+        )
+
+    ################################################################################
+    #  Warm-up
+    ################################################################################
+
+    def _get_warm_up_models(self):
+        if self.warm_up_models is True:
+            return get_indexed_models()
+        models = set()
+        for label in self.warm_up_models or []:
+            # Searches on a model search the indexes of its descendants too
+            models.update(get_descendant_models(apps.get_model(label)))
+        return [model for model in models if class_is_indexed(model)]
+
+    def warm_up(self, models=None):
+        """
+        Builds the schemas of the models, opens a searcher on each of their
+        indexes and imports the query parser, so that the first searches don't
+        have to. Defaults to the models of the WARM_UP option.
+        """
+        if models is None:
+            models = self._get_warm_up_models()
+        for model in models:
+            timings = Timings()
+            with timings.phase("parse"):
+                self.query_compiler_class(
+                    model.objects.none(), PlainText("")
+                ).get_whoosh_query()
+            for indexname in self.get_shard_names(model):
+                with timings.phase("open:%s" % indexname):
+                    with self.searcher_pool.searcher(indexname):
+                        pass
+            timings.stop()
+            logger.debug("Warmed up %s: %s", model._meta.label, timings)
+
+    ################################################################################
+    #  Cross-model search
+    ################################################################################
+
+    def search_models(
+        self, query, models_or_querysets, fields=None, operator=None, partial_match=True
+    ):
+        """
+        Searches several unrelated models, or querysets, at once. The results
+        are ranked together by relevance, normalized for each model.
+        """
+        model_results = []
+        for model_or_queryset in models_or_querysets:
+            results = self.search(
+                query,
+                model_or_queryset,
+                fields=fields,
+                operator=operator,
+                partial_match=partial_match,
+            )
+            if not isinstance(results, EmptySearchResults):
+                model_results.append(results)
+        if not model_results:
+            return WhooshEmptySearchResults()
+        return WhooshMultiModelSearchResults(self, model_results)
+
+    ################################################################################
+    #  Async API, searches run in a thread pool shared by all backends
+    ################################################################################
+
+    def _run_in_executor(self, func, *args, **kwargs):
+        import asyncio
+
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(
+            get_executor("search", self.search_threads),
+            functools.partial(_call_with_db_connections, func, *args, **kwargs),
+        )
+
+    def _search(self, *args, **kwargs):
+        results = super()._search(*args, **kwargs)
+        if isinstance(results, EmptySearchResults):
+            # Keep the async API available on empty results as well
+            return WhooshEmptySearchResults()
+        return results
+
+    async def asearch(self, *args, **kwargs):
+        # Building the results is lazy, the search runs when they are awaited
+        return self.search(*args, **kwargs)
+
+    async def aautocomplete(self, *args, **kwargs):
+        return self.autocomplete(*args, **kwargs)
+
+    async def asearch_models(self, *args, **kwargs):
+        return self.search_models(*args, **kwargs)
+
     # TODO: Always pass the backend in query classes.
     def query_compiler_class(self, *args, **kwargs):
         kwargs["backend"] = self
@@ -524,15 +2235,22 @@ class WhooshSearchBackend(BaseSearchBackend):
     #  Custom methods about schema
     ################################################################################
 
-    def build_schema(self, model):
-        search_fields = dict(self._prepare_search_fields(model))
-        schema_fields = {
-            PK: WHOOSH_ID(stored=True, unique=True),
-        }
-        schema_fields.update(search_fields)
-        return Schema(**schema_fields)
-
-    def _to_whoosh_field(self, field, field_name=None):
+    def build_schema(self, model, locale=None):
+        analyzer = self.get_analyzer(locale)
+        # Analyzers can't be hashed, they are told apart by identity
+        key = (model, id(analyzer), tuple(self.ngram_length))
+        schema = _schema_cache.get(key)
+        if schema is None:
+            search_fields = dict(self._prepare_search_fields(model, analyzer))
+            schema_fields = {
+                PK: WHOOSH_ID(stored=True, unique=True),
+                CONTENT_HASH: STORED(),
+            }
+            schema_fields.update(search_fields)
+            schema = _schema_cache[key] = Schema(**schema_fields)
+        return schema
+
+    def _to_whoosh_field(self, field, field_name=None, analyzer=None):
         # If the field is AutocompleteField or has partial_match field, treat it as auto complete field
         if isinstance(field, AutocompleteField) or (
             hasattr(field, "partial_match") and field.partial_match
@@ -548,15 +2266,14 @@ class WhooshSearchBackend(BaseSearchBackend):
             whoosh_field = TEXT(
                 stored=False,
                 field_boost=get_boost(field),
-                lang=self.language,
-                analyzer=self.analyzer,
+                analyzer=analyzer or self.get_analyzer(),
             )
 
         if not field_name:
             field_name = _get_field_mapping(field)
         return field_name, whoosh_field
 
-    def _prepare_search_fields(self, model):
+    def _prepare_search_fields(self, model, analyzer=None):
         for field in model.get_search_fields():
             if isinstance(field, RelatedFields):
                 for subfield in field.fields:
@@ -564,9 +2281,15 @@ class WhooshSearchBackend(BaseSearchBackend):
                     field_name = "{0}__{1}".format(
                         field.field_name, _get_field_mapping(subfield)
                     )
-                    yield self._to_whoosh_field(subfield, field_name=field_name)
+                    yield self._to_whoosh_field(
+                        subfield, field_name=field_name, analyzer=analyzer
+                    )
             else:
-                yield self._to_whoosh_field(field)
+                yield self._to_whoosh_field(field, analyzer=analyzer)
+                if _get_sort_type(model, field) is not None:
+                    yield field.field_name + SORT_SUFFIX, COLUMN(
+                        NumericColumn("q", default=SORT_DEFAULT)
+                    )
 
 
 SearchBackend = WhooshSearchBackend
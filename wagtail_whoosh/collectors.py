@@ -0,0 +1,104 @@
+from heapq import heappush, heapreplace
+
+from whoosh.collectors import Collector, UnsortedCollector
+
+
+class LimitedUnsortedCollector(UnsortedCollector):
+    """
+    Collects the first ``limit`` matches, without scoring or sorting them
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+
+    def matches(self):
+        for sub_docnum in super().matches():
+            if len(self.items) >= self.limit:
+                return
+            yield sub_docnum
+
+
+class _Descending:
+    """
+    Reverses the order of a value, so that a min-heap keeps the largest values
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class SearchAfterCollector(Collector):
+    """
+    Collects the ``limit`` hits ranked right after ``after`` in a bounded heap,
+    so that a deep page costs about as much as the first one.
+
+    Hits are ranked by ascending ``(-score, pk)``, or by the values of the
+    ``sort_fields`` columns then pk. ``after`` is the rank of the last hit of
+    the previous page, ``None`` for the first page. The results are
+    ``(pk, rank)`` pairs, best first.
+    """
+
+    def __init__(self, pk_field, limit=None, after=None, sort_fields=None):
+        self.pk_field = pk_field
+        self.limit = limit
+        self.after = after
+        self.sort_fields = sort_fields
+
+    def prepare(self, top_searcher, q, context):
+        # Scores are read from the matcher
+        super().prepare(top_searcher, q, context.set(needs_current=True))
+        self.items = []
+
+    def set_subsearcher(self, subsearcher, offset):
+        super().set_subsearcher(subsearcher, offset)
+        reader = subsearcher.reader()
+        if not reader.doc_count_all():
+            # Empty indexes have no columns, nor documents to collect
+            self.columns = []
+            return
+        self.columns = [
+            (reader.column_reader(name, translate=False), reverse)
+            for name, reverse in self.sort_fields or []
+        ]
+
+    def _partial_rank(self, sub_docnum):
+        if not self.sort_fields:
+            return (0 - self.matcher.score(),)
+        return tuple(
+            0 - column[sub_docnum] if reverse else column[sub_docnum]
+            for column, reverse in self.columns
+        )
+
+    def collect(self, sub_docnum):
+        # The pk is only read for documents which may make it into the heap
+        partial_rank = self._partial_rank(sub_docnum)
+        after = self.after
+        if after is not None and partial_rank < after[:-1]:
+            return None
+        items = self.items
+        full = self.limit is not None and len(items) >= self.limit
+        if full and partial_rank > items[0][0].value[:-1]:
+            return None
+
+        pk = self.subsearcher.stored_fields(sub_docnum)[self.pk_field]
+        rank = partial_rank + (pk,)
+        if after is not None and rank <= after:
+            return None
+        item = (_Descending(rank), self.offset + sub_docnum)
+        if not full:
+            heappush(items, item)
+        elif items[0][0] < item[0]:
+            heapreplace(items, item)
+        return rank
+
+    def results(self):
+        ranks = sorted(item[0].value for item in self.items)
+        return [(rank[-1], rank) for rank in ranks]
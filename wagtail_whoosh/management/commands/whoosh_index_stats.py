@@ -0,0 +1,117 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+from wagtail.search.backends import get_search_backend
+
+from ...backend import WhooshSearchBackend
+
+
+class Command(BaseCommand):
+    help = "Reports the health of every Whoosh index, and optimizes them on demand."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backend", default="default", help="Name of the search backend."
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Output the statistics as JSON."
+        )
+        parser.add_argument(
+            "--field-terms",
+            action="store_true",
+            help="Count the terms of each field, this reads the whole term dictionary.",
+        )
+        parser.add_argument(
+            "--check-locks",
+            action="store_true",
+            help=(
+                "Report whether a writer holds the lock of each index. The lock is "
+                "taken for an instant, writers asking for it then may fail."
+            ),
+        )
+        parser.add_argument(
+            "--optimize-deleted-ratio",
+            type=float,
+            help="Optimize indexes with a higher ratio of deleted documents.",
+        )
+        parser.add_argument(
+            "--optimize-segments",
+            type=int,
+            help="Optimize indexes with more segments.",
+        )
+
+    def needs_optimize(self, stats, options):
+        deleted_ratio = options["optimize_deleted_ratio"]
+        if deleted_ratio is not None and stats["deleted_ratio"] > deleted_ratio:
+            return True
+        segments = options["optimize_segments"]
+        if segments is not None and stats["segments"] > segments:
+            return True
+        return False
+
+    def format_locked(self, locked):
+        if locked is None:
+            return "-"
+        return "yes" if locked else "no"
+
+    def write_table(self, all_stats):
+        self.stdout.write(
+            "%-40s %10s %10s %9s %9s %12s %11s %7s"
+            % (
+                "index",
+                "documents",
+                "db rows",
+                "deleted",
+                "segments",
+                "size (kB)",
+                "generation",
+                "locked",
+            )
+        )
+        for stats in all_stats:
+            self.stdout.write(
+                "%-40s %10s %10s %8.1f%% %9s %12.1f %11s %7s"
+                % (
+                    stats["name"],
+                    stats["doc_count"],
+                    "-" if stats["db_count"] is None else stats["db_count"],
+                    stats["deleted_ratio"] * 100,
+                    stats["segments"],
+                    stats["size_bytes"] / 1024,
+                    stats["generation"],
+                    self.format_locked(stats["locked"]),
+                )
+            )
+            if stats.get("optimized"):
+                self.stdout.write("  optimized")
+            for fieldname, count in sorted(stats.get("field_terms", {}).items()):
+                self.stdout.write("  %-38s %10s terms" % (fieldname, count))
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options["backend"])
+        if not isinstance(backend, WhooshSearchBackend):
+            raise CommandError(
+                "The '%s' search backend is not a Whoosh backend." % options["backend"]
+            )
+
+        all_stats = []
+        for indexname in backend.get_index_names():
+            stats = backend.get_index_stats(
+                indexname,
+                field_terms=options["field_terms"],
+                check_lock=options["check_locks"],
+            )
+            if self.needs_optimize(stats, options):
+                backend.optimize_index(indexname)
+                stats = backend.get_index_stats(
+                    indexname,
+                    field_terms=options["field_terms"],
+                    check_lock=options["check_locks"],
+                )
+                stats["optimized"] = True
+            all_stats.append(stats)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(all_stats, indent=2))
+        else:
+            self.write_table(all_stats)
@@ -0,0 +1,30 @@
+from django.core.management import BaseCommand, CommandError
+from wagtail.search.backends import get_search_backend
+
+from ...backend import WhooshSearchBackend
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports the last commit of every Whoosh index to a compressed archive, "
+        "without blocking writers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archive", help="Path of the .tar.gz archive to write.")
+        parser.add_argument(
+            "--backend", default="default", help="Name of the search backend."
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options["backend"])
+        if not isinstance(backend, WhooshSearchBackend):
+            raise CommandError(
+                "The '%s' search backend is not a Whoosh backend." % options["backend"]
+            )
+
+        with open(options["archive"], "wb") as archive:
+            manifest = backend.export_snapshot(archive)
+        self.stdout.write(
+            "Exported %d indexes to %s" % (len(manifest["indexes"]), options["archive"])
+        )
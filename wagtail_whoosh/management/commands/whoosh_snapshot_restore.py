@@ -0,0 +1,71 @@
+import tarfile
+
+from django.core.management import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+from wagtail.search.backends import get_search_backend
+
+from ...backend import WhooshSearchBackend
+
+
+class Command(BaseCommand):
+    help = (
+        "Replaces the Whoosh indexes by the ones of a snapshot, then indexes the "
+        "rows changed since the snapshot."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archive", help="Path of the .tar.gz archive to restore.")
+        parser.add_argument(
+            "--backend", default="default", help="Name of the search backend."
+        )
+        parser.add_argument(
+            "--no-catch-up",
+            action="store_false",
+            dest="catch_up",
+            help="Don't index the changes made since the snapshot.",
+        )
+        parser.add_argument(
+            "--modified-field",
+            help=(
+                "Datetime field of the models updated on every change, only the "
+                "rows modified since the snapshot are indexed again."
+            ),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help=(
+                "Number of rows fetched at once when catching up, "
+                "INDEXING_CHUNK_SIZE by default."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options["backend"])
+        if not isinstance(backend, WhooshSearchBackend):
+            raise CommandError(
+                "The '%s' search backend is not a Whoosh backend." % options["backend"]
+            )
+
+        try:
+            with open(options["archive"], "rb") as archive:
+                manifest = backend.restore_snapshot(archive)
+        except (OSError, EOFError, ValueError, tarfile.TarError) as e:
+            raise CommandError("Can't restore %s: %s" % (options["archive"], e))
+        self.stdout.write(
+            "Restored %d indexes from %s"
+            % (len(manifest["indexes"]), manifest["created_at"])
+        )
+        if not options["catch_up"]:
+            return
+
+        changes = backend.catch_up(
+            since=parse_datetime(manifest["created_at"]),
+            modified_field=options["modified_field"],
+            chunk_size=options["chunk_size"],
+        )
+        for label, (written, deleted) in sorted(changes.items()):
+            if written or deleted:
+                self.stdout.write(
+                    "%s: %d documents updated, %d deleted" % (label, written, deleted)
+                )
@@ -0,0 +1,159 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from whoosh.filedb.filestore import FileStorage
+from whoosh.index import TOC
+
+from .utils import LRUCache
+
+_searcher_pools = {}
+_hash_caches = {}
+_autocomplete_caches = {}
+_executors = {}
+_registry_lock = threading.Lock()
+
+
+class WhooshSearcherPool:
+    """
+    Keeps idle searchers open between searches, per index name.
+
+    Opening a searcher reads the index TOC and the files of every segment, which
+    dominates the cost of small queries. An idle searcher is only handed out
+    again while the index is still at the generation it was opened on.
+    """
+
+    def __init__(self, path, max_idle=4):
+        self.storage = FileStorage(path)
+        self.max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _version(self, indexname):
+        generation = TOC._latest_generation(self.storage, indexname)
+        if generation < 0:
+            return None
+        try:
+            modified = self.storage.file_modified(TOC._filename(indexname, generation))
+        except OSError:
+            # A writer replaced the TOC between listing and stat, so this version
+            # won't match any idle searcher
+            modified = None
+        # The TOC mtime tells a rebuilt index apart from the old one if both
+        # happen to reach the same generation
+        return generation, modified
+
+    def _checkout(self, indexname, version):
+        with self._lock:
+            idle = self._idle.get(indexname, [])
+            while idle:
+                idle_version, searcher = idle.pop()
+                if idle_version == version:
+                    return searcher
+                searcher.close()
+        return self.storage.open_index(indexname=indexname).searcher()
+
+    def _checkin(self, indexname, version, searcher):
+        with self._lock:
+            idle = self._idle.setdefault(indexname, [])
+            if version[1] is not None and len(idle) < self.max_idle:
+                idle.append((version, searcher))
+                return
+        searcher.close()
+
+    @contextmanager
+    def versioned_searcher(self, indexname):
+        """
+        Yields the version of the index and a searcher for it, or ``(None,
+        None)`` if the index doesn't exist. The version is a ``(generation,
+        TOC mtime)`` pair, the mtime is ``None`` when it couldn't be read.
+        """
+        version = self._version(indexname)
+        if version is None:
+            yield None, None
+            return
+
+        searcher = self._checkout(indexname, version)
+        generation = searcher.reader().generation()
+        # Readers of empty indexes have no generation
+        if generation is not None and generation != version[0]:
+            # A writer committed since the version was read, a new searcher
+            # is on its generation and isn't kept
+            version = (generation, None)
+        try:
+            yield version, searcher
+        finally:
+            self._checkin(indexname, version, searcher)
+
+    @contextmanager
+    def searcher(self, indexname):
+        """
+        Yields a searcher for the index, or ``None`` if the index doesn't exist.
+        """
+        with self.versioned_searcher(indexname) as (_, searcher):
+            yield searcher
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for searchers in idle.values():
+            for _, searcher in searchers:
+                searcher.close()
+
+
+def get_searcher_pool(path, max_idle=4):
+    """
+    Returns the searcher pool for an index directory.
+
+    Wagtail creates a new backend instance on every ``get_search_backend`` call,
+    so pools are shared between all backends pointing at the same path.
+    """
+    key = os.path.abspath(path)
+    with _registry_lock:
+        pool = _searcher_pools.get(key)
+        if pool is None:
+            pool = _searcher_pools[key] = WhooshSearcherPool(key, max_idle=max_idle)
+        return pool
+
+
+def get_hash_cache(path, maxsize=1000):
+    """
+    Returns the cache of the content hashes of the documents recently read from
+    the indexes of a directory, keyed by ``(index name, pk)``. Each hash is
+    stored with the version of the index it was read from.
+    """
+    key = os.path.abspath(path)
+    with _registry_lock:
+        cache = _hash_caches.get(key)
+        if cache is None:
+            cache = _hash_caches[key] = LRUCache(maxsize)
+        return cache
+
+
+def get_autocomplete_cache(path, maxsize=256):
+    """
+    Returns the cache of the hits of recent autocomplete queries on the indexes
+    of a directory, keyed by the version of the index they were found in.
+    """
+    key = os.path.abspath(path)
+    with _registry_lock:
+        cache = _autocomplete_caches.get(key)
+        if cache is None:
+            cache = _autocomplete_caches[key] = LRUCache(maxsize)
+        return cache
+
+
+def get_executor(name, max_workers):
+    """
+    Returns a thread pool shared by all backends.
+
+    Pools are named so that work submitted from one pool (e.g. an async search
+    fanning out over descendant indexes) never waits on a slot in the same pool.
+    """
+    key = (name, max_workers)
+    with _registry_lock:
+        executor = _executors.get(key)
+        if executor is None:
+            executor = _executors[key] = ThreadPoolExecutor(max_workers=max_workers)
+        return executor
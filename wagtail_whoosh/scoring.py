@@ -0,0 +1,51 @@
+from whoosh import scoring
+
+K1_SUFFIX = "_K1"
+BM25F_PARAMS = ("B", "K1")
+WEIGHTING_MODELS = ("bm25f", "tfidf", "frequency")
+
+
+class BM25F(scoring.BM25F):
+    """
+    BM25F accepting field specific values for ``K1`` as well as ``B``, with
+    keyword arguments such as ``title_B=0.5, title_K1=2.0``.
+    """
+
+    def __init__(self, B=0.75, K1=1.2, **kwargs):
+        super().__init__(B=B, K1=K1, **kwargs)
+        self._field_K1 = {
+            key[: -len(K1_SUFFIX)]: value
+            for key, value in kwargs.items()
+            if key.endswith(K1_SUFFIX)
+        }
+
+    def scorer(self, searcher, fieldname, text, qf=1):
+        if not searcher.schema[fieldname].scorable:
+            return scoring.WeightScorer.for_(searcher, fieldname, text)
+
+        B = self._field_B.get(fieldname, self.B)
+        K1 = self._field_K1.get(fieldname, self.K1)
+        return scoring.BM25FScorer(searcher, fieldname, text, B, K1, qf=qf)
+
+
+def build_weighting(name, params=None):
+    """
+    Returns the weighting model called ``name``, ``params`` are the ``B``, ``K1``
+    and ``FIELDS`` ({field name: {"B": ..., "K1": ...}}) of BM25F.
+    """
+    if name == "tfidf":
+        return scoring.TF_IDF()
+    if name == "frequency":
+        return scoring.Frequency()
+    if name != "bm25f":
+        raise ValueError("Unknown weighting model %s" % name)
+
+    params = dict(params or {})
+    field_params = params.pop("FIELDS", {})
+    kwargs = {}
+    for fieldname, values in [(None, params)] + sorted(field_params.items()):
+        for key, value in values.items():
+            if key not in BM25F_PARAMS:
+                raise ValueError("Unknown BM25F parameter %s" % key)
+            kwargs[key if fieldname is None else "%s_%s" % (fieldname, key)] = value
+    return BM25F(**kwargs)
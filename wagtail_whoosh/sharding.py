@@ -0,0 +1,40 @@
+"""
+Splitting the index of a model into shards, documents are routed by a hash of
+their primary key.
+
+This module only depends on Whoosh so that rebuild worker processes don't need
+Django to be set up.
+"""
+
+import zlib
+
+from whoosh.filedb.filestore import FileStorage
+
+SHARD_NAME = "%s.shard%d"
+
+
+def get_shard_names(label, shards):
+    """
+    Returns the index names of a model, the label itself when it isn't sharded
+    so existing indexes keep working.
+    """
+    if shards == 1:
+        return [label]
+    return [SHARD_NAME % (label, shard) for shard in range(shards)]
+
+
+def get_shard(pk, shards):
+    # hash() of strings changes between processes, CRC32 doesn't
+    return zlib.crc32(str(pk).encode("utf-8")) % shards
+
+
+def write_documents(path, indexname, documents, writerargs):
+    """
+    Adds documents to an index, run by worker processes when shards are rebuilt
+    in parallel. The index must not be written by anything else at the same time.
+    """
+    index = FileStorage(path).open_index(indexname=indexname)
+    with index.writer(**writerargs) as writer:
+        for document in documents:
+            writer.add_document(**document)
+    return len(documents)
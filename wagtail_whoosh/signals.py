@@ -0,0 +1,16 @@
+from django.dispatch import Signal
+
+# Sent after each search with the model searched as sender and the ``backend``,
+# ``operation`` ("search" or "autocomplete"), ``query`` and ``timings``.
+search_finished = Signal()
+
+# Sent after each indexing operation with the indexed model as sender and the
+# ``backend``, ``operation`` ("add_item", "add_items" or "delete_item"),
+# ``documents`` count and ``timings``.
+indexing_finished = Signal()
+
+# Sent after each chunk of items built by ``add_items`` with the indexed model as
+# sender and the ``backend``, ``documents`` built, ``duration`` in seconds,
+# ``buffered_bytes`` (estimated size of the documents not written yet) and
+# ``peak_rss_kb`` of the process.
+indexing_progress = Signal()
@@ -0,0 +1,158 @@
+"""
+Snapshots of all the indexes of a folder in one compressed archive, restored
+on new hosts instead of rebuilding the indexes from the database.
+
+This module only depends on Whoosh, like the sharding module.
+"""
+
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+
+from whoosh.index import TOC
+
+MANIFEST = "snapshot.json"
+SNAPSHOT_VERSION = 1
+# Times the files of an index are opened again when a commit deleted them first
+OPEN_ATTEMPTS = 10
+# The default level 9 is several times slower for a 1% smaller archive
+COMPRESS_LEVEL = 6
+
+
+def _close_files(files):
+    for _, file in files:
+        file.close()
+
+
+def open_index_files(storage, indexname):
+    """
+    Returns the generation of the last commit of an index, and its opened
+    ``[(filename, file)]``.
+
+    Writers aren't blocked. A commit deletes the files of the previous
+    generation, which can still be read once they are open, so the files of
+    the new generation are opened instead when some were deleted first.
+    """
+    for _ in range(OPEN_ATTEMPTS):
+        files = []
+        try:
+            toc = TOC.read(storage, indexname)
+            filenames = [TOC._filename(indexname, toc.generation)]
+            for segment in toc.segments:
+                filenames.extend(segment.list_files(storage))
+            for filename in filenames:
+                path = os.path.join(storage.folder, filename)
+                files.append((filename, open(path, "rb")))
+        except FileNotFoundError:
+            _close_files(files)
+            continue
+        return toc.generation, files
+    raise RuntimeError("The index %s kept changing while it was opened" % indexname)
+
+
+def _add_file(archive, filename, file, size):
+    info = tarfile.TarInfo(filename)
+    info.size = size
+    info.mtime = time.time()
+    archive.addfile(info, file)
+
+
+def export_snapshot(storage, indexnames, fileobj, created_at):
+    """
+    Writes the last commit of every index to ``fileobj`` as a gzipped tar
+    archive, and returns its manifest. ``created_at`` must be taken before the
+    snapshot, the changes made since are caught up after restoring it.
+    """
+    opened = {}
+    try:
+        # Open the files of every index first, so that all the indexes are
+        # taken at about the same time
+        for indexname in indexnames:
+            opened[indexname] = open_index_files(storage, indexname)
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "created_at": created_at,
+            "indexes": {
+                indexname: generation
+                for indexname, (generation, _) in sorted(opened.items())
+            },
+        }
+        with tarfile.open(
+            fileobj=fileobj, mode="w:gz", compresslevel=COMPRESS_LEVEL
+        ) as archive:
+            data = json.dumps(manifest, indent=2).encode("utf-8")
+            _add_file(archive, MANIFEST, io.BytesIO(data), len(data))
+            for _, files in opened.values():
+                for filename, file in files:
+                    _add_file(archive, filename, file, os.fstat(file.fileno()).st_size)
+    finally:
+        for _, files in opened.values():
+            _close_files(files)
+    return manifest
+
+
+def restore_snapshot(fileobj, path):
+    """
+    Replaces the indexes in ``path`` by the ones of a snapshot, and returns
+    its manifest. The files are extracted next to ``path`` and swapped in once
+    the whole archive was read.
+    """
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    extracted = tempfile.mkdtemp(prefix=".snapshot-", dir=parent)
+    try:
+        manifest = None
+        with tarfile.open(fileobj=fileobj, mode="r:gz") as archive:
+            for member in archive:
+                name = member.name
+                if not member.isfile() or os.path.basename(name) != name:
+                    raise ValueError("Unexpected file %s in the snapshot" % name)
+                source = archive.extractfile(member)
+                if name == MANIFEST:
+                    manifest = json.loads(source.read().decode("utf-8"))
+                    continue
+                with open(os.path.join(extracted, name), "wb") as destination:
+                    shutil.copyfileobj(source, destination)
+        if manifest is None or manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError("The archive isn't a snapshot of Whoosh indexes")
+
+        replaced = tempfile.mkdtemp(prefix=".replaced-", dir=parent)
+        try:
+            if os.path.exists(path):
+                # Temporary folders are only readable by their owner
+                shutil.copymode(path, extracted)
+                os.rename(path, os.path.join(replaced, "indexes"))
+        except OSError:
+            # Mount points, like the volumes of containers, can't be moved
+            _swap_contents(extracted, path)
+        else:
+            os.rename(extracted, path)
+        finally:
+            shutil.rmtree(replaced)
+    except BaseException:
+        shutil.rmtree(extracted, ignore_errors=True)
+        raise
+    return manifest
+
+
+def _swap_contents(extracted, path):
+    """
+    Replaces the files of ``path`` by the ones of ``extracted``, which is
+    removed. The old files are moved out first, so that searches never open a
+    newer table of contents of the old indexes.
+    """
+    replaced = tempfile.mkdtemp(prefix=".replaced-", dir=path)
+    try:
+        for name in os.listdir(path):
+            if name != os.path.basename(replaced):
+                os.rename(os.path.join(path, name), os.path.join(replaced, name))
+        for name in os.listdir(extracted):
+            # The files are copied when ``path`` is on another file system
+            shutil.move(os.path.join(extracted, name), os.path.join(path, name))
+    finally:
+        shutil.rmtree(replaced)
+    os.rmdir(extracted)
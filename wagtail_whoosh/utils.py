@@ -1,6 +1,14 @@
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from functools import lru_cache
+from html.parser import HTMLParser
+from itertools import islice
+from time import perf_counter
 
 from django.apps import apps
+from django.db import models
 
 from wagtail.search.index import Indexed
 
@@ -13,6 +21,51 @@ except ImportError:
         return value
 
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Elements whose text must not be glued to the text around them
+BLOCK_TAGS = frozenset(
+    [
+        "address",
+        "article",
+        "aside",
+        "blockquote",
+        "br",
+        "dd",
+        "div",
+        "dl",
+        "dt",
+        "embed",
+        "figcaption",
+        "figure",
+        "footer",
+        "h1",
+        "h2",
+        "h3",
+        "h4",
+        "h5",
+        "h6",
+        "header",
+        "hr",
+        "img",
+        "li",
+        "ol",
+        "p",
+        "pre",
+        "section",
+        "table",
+        "td",
+        "th",
+        "tr",
+        "ul",
+    ]
+)
+SKIPPED_TAGS = frozenset(["script", "style", "template"])
+
+
 @lru_cache()
 def get_indexed_parents(model):
     """
@@ -45,3 +98,172 @@ def get_boost(field):
         # FIXME might be a value between 0.0->1.0, docs unclear
         return float(field.boost)
     return 1.0
+
+
+def peak_rss_kb():
+    """
+    Returns the peak resident memory of the process in kilobytes, ``None`` if
+    the platform can't tell
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        # Reported in bytes on macOS, kilobytes elsewhere
+        peak //= 1024
+    return peak
+
+
+def iter_chunks(items, chunk_size):
+    """
+    Yields lists of at most ``chunk_size`` items.
+
+    Querysets are streamed instead of being loaded at once, with
+    ``iterator()``, or by ranges of primary keys when they prefetch related
+    objects since ``iterator()`` ignores ``prefetch_related``.
+    """
+    if isinstance(items, models.QuerySet) and items._result_cache is None:
+        if items._prefetch_related_lookups and items.query.can_filter():
+            yield from _iter_queryset_by_pk(items, chunk_size)
+            return
+        items = items.iterator(chunk_size=chunk_size)
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_queryset_by_pk(queryset, chunk_size):
+    queryset = queryset.order_by("pk")
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(page[:chunk_size])
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1].pk
+
+
+class Timings:
+    """
+    Durations in seconds of the phases of a search or an indexing operation.
+
+    Durations of a phase run several times (e.g. building each document of a
+    batch) are added up. Phases may be timed from several threads.
+    """
+
+    def __init__(self):
+        self.phases = OrderedDict()
+        self.total = None
+        self._start = perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, phase, duration):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + duration
+
+    @contextmanager
+    def phase(self, phase):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, perf_counter() - start)
+
+    def stop(self):
+        self.total = perf_counter() - self._start
+
+    def __str__(self):
+        return ", ".join(
+            "%s=%.2fms" % (phase, duration * 1000)
+            for phase, duration in self.phases.items()
+        )
+
+
+class LRUCache:
+    """
+    Mapping keeping the ``maxsize`` most recently used items, shared between
+    threads.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                return default
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class HTMLTextExtractor(HTMLParser):
+    """
+    Collects the text of an HTML fragment as it is parsed, entities are decoded
+    and tags and their attributes are dropped
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skipped = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skipped += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.skipped = max(0, self.skipped - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_data(self, data):
+        if not self.skipped:
+            self.parts.append(data)
+
+    def get_text(self):
+        return "".join(self.parts)
+
+
+def strip_html(value):
+    """
+    Returns the text of a rich text value, block-level elements are separated by
+    spaces so that the words on both sides aren't joined
+    """
+    if "<" not in value and "&" not in value:
+        return value
+    parser = HTMLTextExtractor()
+    parser.feed(value)
+    parser.close()
+    return parser.get_text()